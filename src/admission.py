@@ -0,0 +1,203 @@
+import math
+import time
+import threading
+import multiprocessing
+from collections import deque
+from contextlib import contextmanager
+
+
+class QueueFullError(Exception):
+    """
+    Raised when the generation queue is full and a request is shed.
+    Attributes:
+        retry_after (int): Suggested number of seconds before retrying.
+    """
+
+    def __init__(self, retry_after):
+        super().__init__(f"Generation queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class DeadlineExceededError(Exception):
+    """
+    Raised when a request's deadline passes before its work is done.
+    """
+
+
+class Deadline:
+    """
+    An absolute deadline carried through retrieval and generation so each stage can
+    drop work for clients that have already given up.
+    Args:
+        timeout_s (float): Seconds from now until the deadline.
+    """
+
+    def __init__(self, timeout_s):
+        self.expires_at = time.monotonic() + timeout_s
+
+    def remaining(self):
+        """
+        Returns:
+            float: Seconds left before the deadline, never negative.
+        """
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        """
+        Returns:
+            bool: True if the deadline has passed.
+        """
+        return self.remaining() <= 0
+
+    def check(self, stage):
+        """
+        Raises if the deadline has passed.
+        Args:
+            stage (str): Name of the stage about to start, used in the error message.
+        Raises:
+            DeadlineExceededError: If the deadline has passed.
+        """
+        if self.expired():
+            raise DeadlineExceededError(f"Deadline exceeded before {stage}")
+
+
+class AdmissionController:
+    """
+    Bounds how many generations run at once and how many may wait for a slot.
+    Requests beyond the queue limit are rejected immediately with a Retry-After
+    estimate instead of piling up behind the LLM; queued requests whose deadline
+    passes while waiting are dropped without ever reaching it.
+    With `shared`, the slots and the queue depth live in shared memory, so processes
+    forked after the controller is created enforce one limit between them; counters
+    and wait-time percentiles stay per process.
+    Attributes:
+        max_concurrency (int): Maximum number of generations running at once.
+        max_queue (int): Maximum number of requests waiting for a slot.
+        waiting (int): Requests currently queued.
+        in_flight (int): Generations currently running.
+    Args:
+        max_concurrency (int, optional): Defaults to 2.
+        max_queue (int, optional): Defaults to 8.
+        window (int, optional): Number of recent wait/service times kept for metrics. Defaults to 1000.
+        shared (bool, optional): Share the limits with forked child processes. Defaults to False.
+    """
+
+    def __init__(self, max_concurrency=2, max_queue=8, window=1000, shared=False):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.counters = {"admitted": 0, "rejected": 0, "expired": 0}
+        self.wait_times = deque(maxlen=window)
+        self.service_times = deque(maxlen=window)
+        if shared:
+            self._slots = multiprocessing.BoundedSemaphore(max_concurrency)
+            self._lock = multiprocessing.Lock()
+            self._depths = multiprocessing.Array("i", 2, lock=False)
+        else:
+            self._slots = threading.BoundedSemaphore(max_concurrency)
+            self._lock = threading.Lock()
+            self._depths = [0, 0]
+
+    @property
+    def waiting(self):
+        return self._depths[0]
+
+    @waiting.setter
+    def waiting(self, value):
+        self._depths[0] = value
+
+    @property
+    def in_flight(self):
+        return self._depths[1]
+
+    @in_flight.setter
+    def in_flight(self, value):
+        self._depths[1] = value
+
+    def retry_after(self):
+        """
+        Estimates how long until a queued request would be served.
+        Returns:
+            int: Seconds, at least 1.
+        """
+        with self._lock:
+            times = list(self.service_times)
+            waiting = self.waiting
+        if not times:
+            return 1
+        average = sum(times) / len(times)
+        return max(1, math.ceil(average * (waiting + 1) / self.max_concurrency))
+
+    @contextmanager
+    def admit(self, deadline=None):
+        """
+        Waits for a generation slot and holds it for the duration of the block.
+        Args:
+            deadline (Deadline, optional): Stop waiting when this deadline passes.
+        Raises:
+            QueueFullError: If no slot is free and the queue is full.
+            DeadlineExceededError: If the deadline passes while waiting.
+        """
+        start = time.monotonic()
+        acquired = self._slots.acquire(False)
+        if not acquired:
+            with self._lock:
+                queue_full = self.waiting >= self.max_queue
+                if queue_full:
+                    self.counters["rejected"] += 1
+                else:
+                    self.waiting += 1
+            if queue_full:
+                raise QueueFullError(self.retry_after())
+            try:
+                timeout = deadline.remaining() if deadline is not None else None
+                acquired = self._slots.acquire(timeout=timeout)
+            finally:
+                with self._lock:
+                    self.waiting -= 1
+            if not acquired:
+                with self._lock:
+                    self.counters["expired"] += 1
+                raise DeadlineExceededError("Deadline exceeded waiting for generation")
+
+        with self._lock:
+            self.in_flight += 1
+            self.counters["admitted"] += 1
+            self.wait_times.append(time.monotonic() - start)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+                self.service_times.append(time.monotonic() - started)
+            self._slots.release()
+
+    def metrics(self):
+        """
+        Returns a snapshot of queue depth, counters and wait-time percentiles. With
+        `shared`, queue depth and in-flight counts cover all processes; the rest is
+        for this process only.
+        Returns:
+            dict: Admission metrics suitable for JSON serialization.
+        """
+        with self._lock:
+            waits = sorted(self.wait_times)
+            snapshot = {
+                "queue_depth": self.waiting,
+                "in_flight": self.in_flight,
+                "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue,
+                **self.counters,
+            }
+
+        def percentile(p):
+            if not waits:
+                return 0.0
+            return waits[min(len(waits) - 1, int(p * len(waits)))]
+
+        snapshot["wait_ms"] = {
+            "p50": round(percentile(0.5) * 1000, 1),
+            "p95": round(percentile(0.95) * 1000, 1),
+            "max": round((waits[-1] if waits else 0.0) * 1000, 1),
+        }
+        return snapshot
@@ -0,0 +1,159 @@
+import os
+import json
+import time
+import threading
+
+
+class AnswerCache:
+    """
+    A persistent cache of precomputed answers keyed by normalized question.
+    Each entry records the collection version (vector store snapshot) it was computed
+    against and the IDs of the chunks retrieved for it. An entry for the current version
+    is served directly; an entry from an older version is still served if retrieval
+    returns the same chunks, so a corpus update only invalidates the questions it affects.
+    The warm-up job is the only writer; serving processes reload the file when it changes.
+    Attributes:
+        cache_path (str): Path to the JSON cache file.
+        entries (dict): Normalized question -> {'version', 'chunk_ids', 'answer', 'updated_at'}.
+        stats (dict): Live-traffic 'hits' and 'misses' counters.
+    Methods:
+        lookup(query, version): Returns a cached answer computed for this version.
+        revalidate(query, version, chunk_ids): Returns a cached answer if its chunks are unchanged.
+        put(query, version, chunk_ids, answer): Stores an answer.
+        save(): Persists the cache.
+        hit_rate(): Returns live-traffic hit statistics.
+    """
+
+    def __init__(self, cache_path="./processed_corpus/answer_cache.json"):
+        self.cache_path = cache_path
+        self.entries = {}
+        self.stats = {"hits": 0, "misses": 0}
+        self._mtime = None
+        self._lock = threading.Lock()
+        self.reload()
+
+    @staticmethod
+    def normalize(query):
+        """
+        Normalizes a question so trivial differences in case and spacing share an entry.
+        Args:
+            query (str): The question.
+        Returns:
+            str: The cache key.
+        """
+        return " ".join(query.lower().split())
+
+    def reload(self):
+        """
+        Reloads the cache file if it has changed since it was last read.
+        Returns:
+            None
+        """
+        try:
+            mtime = os.path.getmtime(self.cache_path)
+        except OSError:
+            return
+        if mtime == self._mtime:
+            return
+        with open(self.cache_path, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+        with self._lock:
+            self.entries, self._mtime = entries, mtime
+
+    def get_entry(self, query):
+        """
+        Args:
+            query (str): The question.
+        Returns:
+            dict or None: The raw cache entry.
+        """
+        self.reload()
+        return self.entries.get(self.normalize(query))
+
+    def lookup(self, query, version):
+        """
+        Returns the cached answer if it was computed against this collection version.
+        Args:
+            query (str): The question.
+            version (str): The current collection version.
+        Returns:
+            str or None: The cached answer.
+        """
+        entry = self.get_entry(query)
+        if entry is not None and entry["version"] == version:
+            return entry["answer"]
+        return None
+
+    def revalidate(self, query, version, chunk_ids):
+        """
+        Returns the cached answer if retrieval still returns the chunks it was built from,
+        and marks it current for this version in memory.
+        Args:
+            query (str): The question.
+            version (str): The current collection version.
+            chunk_ids (list): IDs of the chunks just retrieved for the question.
+        Returns:
+            str or None: The cached answer.
+        """
+        entry = self.get_entry(query)
+        if entry is None or entry["chunk_ids"] != list(chunk_ids):
+            return None
+        with self._lock:
+            entry["version"] = version
+        return entry["answer"]
+
+    def put(self, query, version, chunk_ids, answer):
+        """
+        Stores an answer for a question.
+        Args:
+            query (str): The question.
+            version (str): The collection version it was computed against.
+            chunk_ids (list): IDs of the chunks it was built from.
+            answer (str): The generated answer.
+        Returns:
+            None
+        """
+        with self._lock:
+            self.entries[self.normalize(query)] = {
+                "version": version,
+                "chunk_ids": list(chunk_ids),
+                "answer": answer,
+                "updated_at": time.time(),
+            }
+
+    def save(self):
+        """
+        Atomically persists the cache.
+        Returns:
+            None
+        """
+        os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+        tmp_path = f"{self.cache_path}.tmp"
+        with self._lock:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f, indent=2)
+            os.replace(tmp_path, self.cache_path)
+            self._mtime = os.path.getmtime(self.cache_path)
+
+    def record(self, hit):
+        """
+        Counts a live-traffic lookup.
+        Args:
+            hit (bool): Whether the answer came from the cache.
+        """
+        with self._lock:
+            self.stats["hits" if hit else "misses"] += 1
+
+    def hit_rate(self):
+        """
+        Returns:
+            dict: Live-traffic hits, misses and hit rate.
+        """
+        with self._lock:
+            hits, misses = self.stats["hits"], self.stats["misses"]
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / total, 3) if total else 0.0,
+        }
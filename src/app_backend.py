@@ -1,7 +1,16 @@
-from fastapi import FastAPI
-from pydantic import BaseModel
+import os
+import json
+import fcntl
+import time
+import queue
+import threading
+from typing import Optional
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel, Field
 from fastapi.middleware.cors import CORSMiddleware
+from src.admission import Deadline, DeadlineExceededError, QueueFullError
 from src.generator import Generator
+from src.sharding import validate_where
 
 app = FastAPI()
 
@@ -14,15 +23,113 @@ app.add_middleware(
 )
 
 
+# Default and maximum time a client waits for an answer before the work is dropped
+DEFAULT_TIMEOUT_S = 60
+MAX_TIMEOUT_S = 300
+
+
 class QueryRequest(BaseModel):
     query: str
+    filters: Optional[dict] = None
+    timeout_s: Optional[float] = Field(default=None, gt=0, le=MAX_TIMEOUT_S)
+
+
+# Questions answered, used by the warm-up job to find the most frequent ones. The log
+# is rotated to REQUEST_LOG + ".1" once it reaches REQUEST_LOG_MAX_BYTES
+REQUEST_LOG = "./processed_corpus/request_log.jsonl"
+REQUEST_LOG_MAX_BYTES = 10 * 1024 * 1024
+_request_log_queue = queue.Queue(maxsize=10000)
+
+
+def log_request(request):
+    """
+    Queues an answered question for the request log without blocking the request.
+    Records are dropped if the writer has fallen behind.
+    """
+    try:
+        _request_log_queue.put_nowait({"ts": time.time(), "query": request.query})
+    except queue.Full:
+        pass
 
 
-# Initialize the Generator class once
-generator = Generator()
+def write_request_log():
+    """
+    Appends queued records to the request log in the background, rotating it when full.
+    Every pre-forked worker runs one writer on the same file, so the size check,
+    rotation and append happen under an exclusive lock on a side file.
+    """
+    while True:
+        records = [_request_log_queue.get()]
+        while True:
+            try:
+                records.append(_request_log_queue.get_nowait())
+            except queue.Empty:
+                break
+        lines = "".join(json.dumps(record) + "\n" for record in records)
+        try:
+            with open(f"{REQUEST_LOG}.lock", "a") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    if (
+                        os.path.exists(REQUEST_LOG)
+                        and os.path.getsize(REQUEST_LOG) >= REQUEST_LOG_MAX_BYTES
+                    ):
+                        os.replace(REQUEST_LOG, f"{REQUEST_LOG}.1")
+                    with open(REQUEST_LOG, "a", encoding="utf-8") as f:
+                        f.write(lines)
+                finally:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+        except OSError as e:
+            print(f"Error writing request log: {e}")
+
+
+# Initialized once at startup, unless a pre-forked server has already loaded it
+# in the parent process (see src/scripts/serve.py)
+generator = None
+
+
+@app.on_event("startup")
+def load_generator():
+    global generator
+    os.makedirs(os.path.dirname(REQUEST_LOG), exist_ok=True)
+    # Started here rather than at import so each pre-forked worker runs its own writer
+    threading.Thread(target=write_request_log, name="request-log", daemon=True).start()
+    if generator is None:
+        generator = Generator()
 
 
 @app.post("/chat")
 def chat(request: QueryRequest):
-    answer = generator.generate_answer(request.query)
+    if request.filters:
+        try:
+            validate_where(request.filters)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid filters: {e}")
+    deadline = Deadline(request.timeout_s or DEFAULT_TIMEOUT_S)
+    try:
+        answer = generator.generate_answer(
+            request.query, where=request.filters, deadline=deadline
+        )
+    except QueueFullError as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Server is busy, please retry shortly.",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    except DeadlineExceededError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    # Only questions that were actually answered count towards warm-up frequency
+    if not request.filters:
+        log_request(request)
     return {"answer": answer}
+
+
+@app.get("/metrics")
+def metrics():
+    return {
+        "admission": generator.admission.metrics(),
+        "prompt": generator.prompt_stats,
+        "answer_cache": (
+            generator.answer_cache.hit_rate() if generator.answer_cache else None
+        ),
+    }
@@ -1,8 +1,13 @@
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
 from streamlit_chat import message
 
 API_URL = "http://localhost:8000/chat"
+# (connect, read) timeouts in seconds; generation can take a while on CPU
+REQUEST_TIMEOUT = (3.05, 120)
+# Number of most recent exchanges rendered; older ones are paged in on demand
+HISTORY_WINDOW = 10
 BOT_PROFILE_IMAGE = (
     "https://res.cloudinary.com/webmonc/image/upload/v1696515089/3558860_r0hs4y.png"
 )
@@ -76,39 +81,84 @@ textarea:focus {
 )
 
 
+# --- HTTP Session ---
+@st.cache_resource
+def get_http_session():
+    """
+    Returns a keep-alive HTTP session shared across reruns and browser sessions,
+    so each question reuses a pooled connection to the backend.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=10)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def ask_backend(query):
+    """
+    Sends a question to the backend and returns the answer or a readable error.
+    """
+    try:
+        response = get_http_session().post(
+            API_URL, json={"query": query}, timeout=REQUEST_TIMEOUT
+        )
+    except requests.Timeout:
+        return "⚠️ The server took too long to answer. Please try again."
+    except requests.ConnectionError:
+        return "⚠️ Could not reach the server."
+
+    if response.ok:
+        return response.json()["answer"]
+    try:
+        detail = response.json().get("detail", "Request failed.")
+    except ValueError:
+        detail = "Request failed."
+    return f"⚠️ {detail}"
+
+
+def render_exchange(i, msg):
+    """
+    Renders one question and its answer.
+    """
+    message(
+        msg["query"],
+        is_user=True,
+        key=f"user_{i}",
+        avatar_style="initials",
+        logo=USER_PROFILE_IMAGE,
+    )
+    message(
+        msg["answer"],
+        key=f"bot_{i}",
+        avatar_style="bottts",
+        logo=BOT_PROFILE_IMAGE,
+    )
+
+
 # --- Session State ---
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
-if "thinking" not in st.session_state:
-    st.session_state.thinking = False
+if "visible" not in st.session_state:
+    st.session_state.visible = HISTORY_WINDOW
 
 # --- Chat Display (in scrollable container) ---
-with st.container():
+# Only the most recent window is rendered, so each rerun costs O(window)
+# rather than O(session length)
+chat = st.container()
+with chat:
     st.markdown('<div class="chat-wrapper">', unsafe_allow_html=True)
 
-    for i, msg in enumerate(st.session_state.messages):
-        message(
-            msg["query"],
-            is_user=True,
-            key=f"user_{i}",
-            avatar_style="initials",
-            logo=USER_PROFILE_IMAGE,
-        )
-        if msg["answer"] == "__thinking__":
-            message(
-                "Thinking...",
-                key=f"thinking_{i}",
-                avatar_style="bottts",
-                logo=BOT_PROFILE_IMAGE,
-            )
-        else:
-            message(
-                msg["answer"],
-                key=f"bot_{i}",
-                avatar_style="bottts",
-                logo=BOT_PROFILE_IMAGE,
-            )
+    messages = st.session_state.messages
+    first = max(0, len(messages) - st.session_state.visible)
+    if first > 0:
+        if st.button(f"Show earlier messages ({first} hidden)"):
+            st.session_state.visible += HISTORY_WINDOW
+            st.rerun()
+
+    for i in range(first, len(messages)):
+        render_exchange(i, messages[i])
 
     st.markdown("</div>", unsafe_allow_html=True)
 
@@ -130,21 +180,33 @@ with st.form("chat_form", clear_on_submit=True):
         submitted = st.form_submit_button("Send", use_container_width=True)
 
 
-# --- Append new user message + thinking placeholder ---
+# --- Render the new exchange in place and fill in the answer when it arrives ---
 if submitted and query:
-    st.session_state.messages.append({"query": query, "answer": "__thinking__"})
-    st.session_state.thinking = True
-    st.rerun()
-
-# --- Replace placeholder with real answer ---
-if st.session_state.thinking:
-    last_index = len(st.session_state.messages) - 1
-    last_query = st.session_state.messages[last_index]["query"]
-
-    with st.spinner("Thinking..."):
-        response = requests.post(API_URL, json={"query": last_query})
-        answer = response.json()["answer"]
-
-    st.session_state.messages[last_index]["answer"] = answer
-    st.session_state.thinking = False
-    st.rerun()
+    index = len(st.session_state.messages)
+    with chat:
+        message(
+            query,
+            is_user=True,
+            key=f"user_{index}",
+            avatar_style="initials",
+            logo=USER_PROFILE_IMAGE,
+        )
+        placeholder = st.empty()
+        with placeholder.container():
+            message(
+                "Thinking...",
+                key=f"thinking_{index}",
+                avatar_style="bottts",
+                logo=BOT_PROFILE_IMAGE,
+            )
+
+    answer = ask_backend(query)
+    st.session_state.messages.append({"query": query, "answer": answer})
+
+    with placeholder.container():
+        message(
+            answer,
+            key=f"bot_{index}",
+            avatar_style="bottts",
+            logo=BOT_PROFILE_IMAGE,
+        )
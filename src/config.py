@@ -0,0 +1,22 @@
+import os
+
+CONFIG_PATH = "./config.yaml"
+
+
+def load_config(path=CONFIG_PATH):
+    """
+    Loads the project settings from config.yaml.
+    Args:
+        path (str, optional): Path to the config file. Defaults to "./config.yaml".
+    Returns:
+        dict: The settings, or an empty dict if the file or PyYAML is missing.
+    """
+    if not os.path.exists(path):
+        return {}
+    try:
+        import yaml
+    except ImportError:
+        print("⚠️ PyYAML is not installed, ignoring config.yaml.")
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return yaml.safe_load(f) or {}
@@ -1,6 +1,8 @@
 import os
+import ast
 import json
 import hashlib
+from itertools import islice
 from pathlib import Path
 import pandas as pd
 from pptx import Presentation
@@ -17,14 +19,19 @@ class DataLoader:
         corpus_dir (str): Directory containing the corpus files.
         processed_path (str): Path to the JSON file storing processed file hashes.
         output_path (str): Path to the output JSONL file for processed chunks.
+        csv_rows_per_chunk (int): Number of CSV rows read and emitted per table chunk.
+        csv_per_row (bool or str): Emit one chunk per CSV row; "auto" enables it for
+            sheets with question and answer columns.
         processed_hashes (set): Set of hashes for files that have already been processed.
     Methods:
         load_processed_hashes(): Loads processed file hashes from the JSON file.
         extract_text_from_pdf(file_path): Extracts text from a PDF file.
         extract_text_from_docx(file_path): Extracts text from a DOCX file.
         extract_text_from_pptx(file_path): Extracts text from a PPTX file.
-        extract_text_from_csv(file_path): Extracts text from a CSV file.
-        process_corpus(): Processes all files in the corpus directory, extracting text and metadata.
+        extract_text_from_csv(file_path): Streams a CSV file as row-group or per-row chunks.
+        file_hash(file_path): Returns the hash used to track a processed file.
+        extract_file(file_path): Extracts chunks from a single file based on its extension.
+        process_corpus(deduplicator=None): Streams the chunks of all new files to a temporary JSONL file.
         update_processed_files(): Updates the JSON file with the current set of processed file hashes.
         save_chunks_as_jsonl(chunks): Saves the extracted text chunks to a JSONL file.
     """
@@ -34,10 +41,14 @@ class DataLoader:
         corpus_dir="./corpus",
         processed_path="./processed_corpus/processed_files.json",
         output_path="./processed_corpus/processed_chunks.jsonl",
+        csv_rows_per_chunk=50,
+        csv_per_row="auto",
     ):
         self.corpus_dir = corpus_dir
         self.processed_path = processed_path
         self.output_path = output_path
+        self.csv_rows_per_chunk = csv_rows_per_chunk
+        self.csv_per_row = csv_per_row
         self.processed_hashes = self.load_processed_hashes()
 
     def load_processed_hashes(self):
@@ -122,59 +133,182 @@ class DataLoader:
                 )
         return chunks
 
+    @staticmethod
+    def is_question_answer_sheet(columns):
+        """
+        Detects question/answer-style sheets from their header.
+        Args:
+            columns (list): The CSV column names.
+        Returns:
+            bool: True if there is a question-like and an answer-like column.
+        """
+        names = [str(c).lower() for c in columns]
+        has_question = any("question" in n or n in ("q", "prompt") for n in names)
+        has_answer = any("answer" in n or n in ("a", "solution") for n in names)
+        return has_question and has_answer
+
     def extract_text_from_csv(self, file_path):
         """
-        Extracts text from a CSV file and returns it as a list of dictionaries representing the table.
+        Streams a CSV file in fixed-size row batches so memory stays bounded by the batch
+        size rather than the file size. Each batch becomes one markdown table chunk with
+        the header repeated, or, for question/answer-style sheets, each row becomes its
+        own "column: value" chunk.
         Args:
             file_path (str): Path to the CSV file.
+        Yields:
+            dict: A chunk containing 'content', 'type', and 'metadata'.
+        """
+        reader = pd.read_csv(
+            file_path,
+            chunksize=self.csv_rows_per_chunk,
+            dtype=str,
+            keep_default_na=False,
+        )
+        per_row = None
+        start = 1
+        for batch in reader:
+            if per_row is None:
+                per_row = (
+                    self.is_question_answer_sheet(batch.columns)
+                    if self.csv_per_row == "auto"
+                    else bool(self.csv_per_row)
+                )
+
+            if per_row:
+                for offset, row in enumerate(batch.itertuples(index=False)):
+                    content = "\n".join(
+                        f"{column}: {value}"
+                        for column, value in zip(batch.columns, row)
+                        if value
+                    )
+                    if content:
+                        yield {
+                            "content": content,
+                            "type": "table",
+                            "metadata": {
+                                "source": file_path,
+                                "page_slide": f"Row {start + offset}",
+                                "embedded": False,
+                            },
+                        }
+            else:
+                yield {
+                    "content": batch.to_markdown(index=False),
+                    "type": "table",
+                    "metadata": {
+                        "source": file_path,
+                        "page_slide": f"Rows {start}-{start + len(batch) - 1}",
+                        "embedded": False,
+                    },
+                }
+            start += len(batch)
+
+    @staticmethod
+    def file_hash(file_path):
+        """
+        Returns the hash used to track whether a file has been processed.
+        Args:
+            file_path (str): Path to the file.
         Returns:
-            list: A list containing a single dictionary with 'content', 'type', and 'metadata'.
+            str: The SHA-256 hex digest of the file path.
         """
-        df = pd.read_csv(file_path)
-        return [
-            {
-                "content": df.to_markdown(index=False),
-                "type": "table",
-                "metadata": {"source": file_path, "embedded": False},
-            }
-        ]
+        return hashlib.sha256(file_path.encode()).hexdigest()
+
+    def extract_file(self, file_path):
+        """
+        Extracts text chunks from a single file, dispatching on its extension.
+        Args:
+            file_path (str): Path to the file.
+        Returns:
+            iterable or None: The chunk dictionaries, or None if the format is unsupported.
+        """
+        ext = Path(file_path).suffix.lower()
+        if ext == ".pdf":
+            return self.extract_text_from_pdf(file_path)
+        elif ext == ".docx":
+            return self.extract_text_from_docx(file_path)
+        elif ext == ".pptx":
+            return self.extract_text_from_pptx(file_path)
+        elif ext == ".csv":
+            return self.extract_text_from_csv(file_path)
+        return None
 
-    def process_corpus(self):
+    def process_corpus(self, deduplicator=None, batch_size=1000):
         """
         Processes all files in the corpus directory, extracting text and metadata.
         Skips files that have already been processed based on their hash.
+        Chunks are written to a temporary JSONL file as they are extracted instead of
+        being collected in memory; `run_pipeline` renames it over the output on success.
+        Args:
+            deduplicator (Deduplicator, optional): Near-duplicate filter applied to each
+                file's chunks before they are written.
+            batch_size (int, optional): Chunks deduplicated and written at a time. Defaults to 1000.
         Returns:
-            list: A list of dictionaries, each containing 'content', 'type', and 'metadata'.
+            tuple: (extracted, written) chunk counts.
         """
-        all_chunks = []
-        for root, _, files in os.walk(self.corpus_dir):
-            for file in files:
-                file_path = os.path.join(root, file)
-                file_hash = hashlib.sha256(file_path.encode()).hexdigest()
-
-                if file_hash in self.processed_hashes:
-                    print(f"Skipping already processed file: {file}")
-                    continue
-
-                ext = Path(file).suffix.lower()
-                try:
-                    if ext == ".pdf":
-                        all_chunks.extend(self.extract_text_from_pdf(file_path))
-                    elif ext == ".docx":
-                        all_chunks.extend(self.extract_text_from_docx(file_path))
-                    elif ext == ".pptx":
-                        all_chunks.extend(self.extract_text_from_pptx(file_path))
-                    elif ext == ".csv":
-                        all_chunks.extend(self.extract_text_from_csv(file_path))
-                    else:
-                        print(f"Unsupported file format: {file}")
+        os.makedirs(os.path.dirname(self.output_path) or ".", exist_ok=True)
+        part_path = f"{self.output_path}.part"
+        extracted, written = 0, 0
+        with open(f"{self.output_path}.tmp", "w", encoding="utf-8") as out:
+            for root, _, files in os.walk(self.corpus_dir):
+                for file in files:
+                    file_path = os.path.join(root, file)
+                    file_hash = self.file_hash(file_path)
+
+                    if file_hash in self.processed_hashes:
+                        print(f"Skipping already processed file: {file}")
                         continue
 
+                    try:
+                        chunks = self.extract_file(file_path)
+                        if chunks is None:
+                            print(f"Unsupported file format: {file}")
+                            continue
+
+                        # Stage the file's chunks on disk first so a file that
+                        # fails part-way through contributes nothing
+                        with open(part_path, "w", encoding="utf-8") as part:
+                            for chunk in chunks:
+                                part.write(f"{chunk!r}\n")
+                    except Exception as e:
+                        print(f"Error processing {file_path}: {e}")
+                        continue
+
+                    file_extracted, file_written = self.append_chunks(
+                        part_path, out, deduplicator, batch_size
+                    )
+                    extracted += file_extracted
+                    written += file_written
                     self.processed_hashes.add(file_hash)
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        return extracted, written
 
-                except Exception as e:
-                    print(f"Error processing {file_path}: {e}")
-        return all_chunks
+    @staticmethod
+    def append_chunks(part_path, out, deduplicator=None, batch_size=1000):
+        """
+        Copies a file's staged chunks to the output in batches, deduplicating each batch.
+        Args:
+            part_path (str): JSONL file holding one file's chunks.
+            out (file): Open output file.
+            deduplicator (Deduplicator, optional): Near-duplicate filter.
+            batch_size (int, optional): Chunks processed at a time. Defaults to 1000.
+        Returns:
+            tuple: (read, written) chunk counts.
+        """
+        read, written = 0, 0
+        with open(part_path, "r", encoding="utf-8") as part:
+            while True:
+                batch = [ast.literal_eval(line) for line in islice(part, batch_size)]
+                if not batch:
+                    break
+                read += len(batch)
+                if deduplicator is not None:
+                    batch = deduplicator.deduplicate(batch, report=False)
+                for chunk in batch:
+                    out.write(f"{chunk!r}\n")
+                written += len(batch)
+        return read, written
 
     def update_processed_files(self):
         """
@@ -196,20 +330,29 @@ class DataLoader:
             for chunk in chunks:
                 f.write(f"{chunk}\n")
 
-    def run_pipeline(self):
+    def run_pipeline(self, deduplicator=None):
         """
         Executes the data loading pipeline:
         1. Loads processed file hashes.
-        2. Processes the corpus directory to extract text chunks.
-        3. Saves the extracted chunks to a JSONL file.
+        2. Processes the corpus directory, streaming chunks to a temporary JSONL file
+           and removing near-duplicates if a deduplicator is given.
+        3. Replaces the output JSONL file with it.
         4. Updates the processed files JSON with new hashes.
+        Args:
+            deduplicator (Deduplicator, optional): Near-duplicate filter applied during extraction.
+                Its savings are left for the caller to `report()`, e.g. once embedding
+                time has been measured.
         """
-        chunks = self.process_corpus()
-        if chunks:
-            self.save_chunks_as_jsonl(chunks)
+        tmp_path = f"{self.output_path}.tmp"
+        extracted, written = self.process_corpus(deduplicator)
+        if extracted:
+            if deduplicator is not None:
+                deduplicator.save()
+            os.replace(tmp_path, self.output_path)
             self.update_processed_files()
-            print(f"✅ Extracted {len(chunks)} chunks to {self.output_path}")
+            print(f"✅ Extracted {written} chunks to {self.output_path}")
         else:
+            os.remove(tmp_path)
             print("📂 No new files found to process.")
 
 
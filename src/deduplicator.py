@@ -0,0 +1,325 @@
+import os
+import re
+import json
+import hashlib
+from collections import defaultdict
+import numpy as np
+from src.embedder import Embedder
+
+# Mersenne prime used for the MinHash permutations; keeps a * h + b within uint64
+_PRIME = (1 << 31) - 1
+
+
+class Deduplicator:
+    """
+    Removes near-duplicate chunks at ingestion using MinHash signatures and an LSH index.
+    Each chunk is shingled into word n-grams and summarized by a MinHash signature. The
+    signature is split into bands, and chunks that share a band bucket are compared by
+    estimated Jaccard similarity. Only the first (canonical) copy is kept; it records
+    every source location it was found at. Signatures persist across runs, so a copy in
+    a newly added file is matched against chunks that were indexed earlier.
+    Attributes:
+        index_path (str): Path to the JSON file persisting signatures and locations.
+        num_perm (int): Number of MinHash permutations.
+        bands (int): Number of LSH bands; `num_perm` must be divisible by it.
+        threshold (float): Minimum estimated Jaccard similarity to count as a duplicate.
+        shingle_size (int): Number of words per shingle.
+        entries (dict): Canonical chunk ID -> {'signature', 'source', 'locations'}, where
+            each location is a [source, page_slide] pair.
+        location_updates (dict): Canonical IDs from earlier runs whose location list grew,
+            mapped to the metadata fields to update in the vector store. Persisted with
+            the index until the caller clears them once they are live.
+    Methods:
+        signature(text): Computes the MinHash signature of a text.
+        deduplicate(chunks): Returns the chunks with near-duplicates merged away.
+        report(seconds_per_chunk=None): Prints and resets the savings since the last report.
+        remove_source(source): Forgets canonicals that came from a removed file and returns
+            the files whose copies must be re-indexed in their place.
+        save(): Persists the index.
+    """
+
+    # Bumped when the persisted layout changes; older indexes are discarded
+    INDEX_VERSION = 2
+
+    def __init__(
+        self,
+        index_path="./processed_corpus/lsh_index.json",
+        num_perm=128,
+        bands=16,
+        threshold=0.8,
+        shingle_size=5,
+        seed=1,
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.index_path = index_path
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, _PRIME, size=num_perm).astype(np.uint64)
+        self.b = rng.randint(0, _PRIME, size=num_perm).astype(np.uint64)
+        self.entries = {}
+        self.buckets = defaultdict(set)
+        self.location_updates = {}
+        self.stats = {"chunks": 0, "removed": 0, "chars": 0, "removed_chars": 0}
+        self.load()
+
+    def load(self):
+        """
+        Loads persisted signatures and rebuilds the LSH buckets.
+        Returns:
+            None
+        """
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if (
+            data.get("num_perm") != self.num_perm
+            or data.get("bands") != self.bands
+            or data.get("version") != self.INDEX_VERSION
+        ):
+            print("⚠️ LSH index parameters or format changed, starting a new index.")
+            return
+        self.location_updates = data.get("location_updates", {})
+        for chunk_id, entry in data["entries"].items():
+            self.entries[chunk_id] = entry
+            for key in self._band_keys(entry["signature"]):
+                self.buckets[key].add(chunk_id)
+
+    def save(self):
+        """
+        Persists signatures, canonical locations and pending location updates.
+        Returns:
+            None
+        """
+        os.makedirs(os.path.dirname(self.index_path) or ".", exist_ok=True)
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "version": self.INDEX_VERSION,
+                    "num_perm": self.num_perm,
+                    "bands": self.bands,
+                    "entries": self.entries,
+                    "location_updates": self.location_updates,
+                },
+                f,
+            )
+        os.replace(tmp_path, self.index_path)
+
+    def shingles(self, text):
+        """
+        Splits text into lower-cased word n-grams.
+        Args:
+            text (str): The chunk text.
+        Returns:
+            set: The shingles; empty if the text has no words.
+        """
+        words = re.findall(r"\w+", text.lower())
+        if len(words) <= self.shingle_size:
+            return {" ".join(words)} if words else set()
+        return {
+            " ".join(words[i : i + self.shingle_size])
+            for i in range(len(words) - self.shingle_size + 1)
+        }
+
+    def signature(self, text):
+        """
+        Computes the MinHash signature of a text.
+        Args:
+            text (str): The chunk text.
+        Returns:
+            list or None: `num_perm` integers, or None if the text has no words.
+        """
+        shingles = self.shingles(text)
+        if not shingles:
+            return None
+        hashes = np.fromiter(
+            (
+                int.from_bytes(
+                    hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "big"
+                )
+                for s in shingles
+            ),
+            dtype=np.uint64,
+            count=len(shingles),
+        )
+        permuted = (self.a[:, None] * hashes[None, :] + self.b[:, None]) % _PRIME
+        return permuted.min(axis=1).tolist()
+
+    def _band_keys(self, signature):
+        return [
+            (band, tuple(signature[band * self.rows : (band + 1) * self.rows]))
+            for band in range(self.bands)
+        ]
+
+    def find_duplicate(self, signature):
+        """
+        Looks up a canonical chunk that is a near-duplicate of the given signature.
+        Args:
+            signature (list): A MinHash signature.
+        Returns:
+            str or None: The canonical chunk ID, or None if there is no match.
+        """
+        candidates = set()
+        for key in self._band_keys(signature):
+            candidates |= self.buckets.get(key, set())
+        query = np.asarray(signature)
+        best_id, best_score = None, self.threshold
+        for chunk_id in candidates:
+            score = float(np.mean(query == np.asarray(self.entries[chunk_id]["signature"])))
+            if score >= best_score:
+                best_id, best_score = chunk_id, score
+        return best_id
+
+    @staticmethod
+    def location(chunk):
+        """
+        Args:
+            chunk (dict): A chunk produced by `DataLoader`.
+        Returns:
+            list: The chunk's [source, page_slide] location.
+        """
+        return [
+            chunk["metadata"].get("source", ""),
+            chunk["metadata"].get("page_slide"),
+        ]
+
+    @staticmethod
+    def location_fields(locations):
+        """
+        Builds the vector store metadata for a canonical's locations.
+        Args:
+            locations (list): [source, page_slide] pairs.
+        Returns:
+            dict: 'locations' ("<source> - <page_slide>", "; "-separated) and 'duplicate_count'.
+        """
+        return {
+            "locations": "; ".join(
+                f"{source} - {page_slide}" if page_slide else source
+                for source, page_slide in locations
+            ),
+            "duplicate_count": len(locations),
+        }
+
+    def deduplicate(self, chunks, report=True):
+        """
+        Returns the chunks with near-duplicates removed. The first copy seen becomes the
+        canonical chunk and gets 'locations' (all source locations, "; "-separated) and
+        'duplicate_count' metadata. Copies of chunks indexed in earlier runs are dropped
+        and their canonical's new metadata is recorded in `location_updates`.
+        Args:
+            chunks (list): Chunks produced by `DataLoader`.
+            report (bool, optional): Print the savings now. Pass False when deduplicating
+                a corpus in batches and call `report()` at the end. Defaults to True.
+        Returns:
+            list: The deduplicated chunks.
+        """
+        kept = []
+        kept_by_id = {}
+        removed, removed_chars = 0, 0
+        total_chars = sum(len(chunk["content"]) for chunk in chunks)
+
+        for chunk in chunks:
+            signature = self.signature(chunk["content"])
+            if signature is None:
+                kept.append(chunk)
+                continue
+
+            canonical_id = self.find_duplicate(signature)
+            if canonical_id is None:
+                chunk_id = Embedder.chunk_id(chunk)
+                self.entries[chunk_id] = {
+                    "signature": signature,
+                    "source": chunk["metadata"].get("source", ""),
+                    "locations": [self.location(chunk)],
+                }
+                for key in self._band_keys(signature):
+                    self.buckets[key].add(chunk_id)
+                kept.append(chunk)
+                kept_by_id[chunk_id] = chunk
+                continue
+
+            entry = self.entries[canonical_id]
+            location = self.location(chunk)
+            if location in entry["locations"]:
+                # A location already recorded, e.g. a file re-extracted to restore
+                # copies orphaned by `remove_source`; its chunk is indexed already
+                continue
+            entry["locations"].append(location)
+            removed += 1
+            removed_chars += len(chunk["content"])
+            fields = self.location_fields(entry["locations"])
+            if canonical_id in kept_by_id:
+                kept_by_id[canonical_id]["metadata"].update(fields)
+            else:
+                self.location_updates[canonical_id] = fields
+
+        self.stats["chunks"] += len(chunks)
+        self.stats["removed"] += removed
+        self.stats["chars"] += total_chars
+        self.stats["removed_chars"] += removed_chars
+        if report:
+            self.report()
+        return kept
+
+    def report(self, seconds_per_chunk=None):
+        """
+        Prints the savings since the last report and resets the counters.
+        Args:
+            seconds_per_chunk (float, optional): Measured embedding time per chunk (see
+                `Embedder.seconds_per_chunk`), used to estimate the embedding time saved.
+        Returns:
+            None
+        """
+        stats = self.stats
+        if stats["chunks"]:
+            embedding_time = (
+                f", ~{stats['removed'] * seconds_per_chunk:.1f}s of embedding time"
+                if seconds_per_chunk is not None
+                else ""
+            )
+            print(
+                f"🧹 Removed {stats['removed']} near-duplicate chunks "
+                f"({stats['removed'] / stats['chunks']:.0%} of {stats['chunks']}): "
+                f"saves {stats['removed']} embeddings and index rows{embedding_time}, "
+                f"{stats['removed_chars'] / max(stats['chars'], 1):.0%} of embedded text, "
+                f"~{stats['removed_chars'] // 4} tokens of duplicated corpus text (chars / 4)"
+            )
+        self.stats = {"chunks": 0, "removed": 0, "chars": 0, "removed_chars": 0}
+
+    def remove_source(self, source):
+        """
+        Forgets canonical chunks that came from a removed or modified file, and drops
+        the file's locations from the remaining canonicals.
+        A forgotten canonical's copies in other files were never indexed, so those
+        files are returned for re-extraction: passing their chunks through `deduplicate`
+        promotes the first surviving copy to canonical, while chunks that are already
+        indexed match their own recorded location and are skipped.
+        Args:
+            source (str): The file path as recorded in chunk metadata.
+        Returns:
+            set: Other files holding copies that must be re-indexed.
+        """
+        reindex = set()
+        for chunk_id, entry in list(self.entries.items()):
+            if entry["source"] == source:
+                for key in self._band_keys(entry["signature"]):
+                    self.buckets[key].discard(chunk_id)
+                del self.entries[chunk_id]
+                self.location_updates.pop(chunk_id, None)
+                reindex.update(
+                    loc_source
+                    for loc_source, _ in entry["locations"]
+                    if loc_source != source
+                )
+                continue
+            kept = [loc for loc in entry["locations"] if loc[0] != source]
+            if len(kept) != len(entry["locations"]):
+                entry["locations"] = kept
+                self.location_updates[chunk_id] = self.location_fields(kept)
+        return reindex
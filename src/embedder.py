@@ -1,4 +1,7 @@
+import os
 import json
+import time
+import hashlib
 from sentence_transformers import SentenceTransformer
 import numpy as np
 
@@ -11,12 +14,15 @@ class Embedder:
     It also updates the original chunks file to mark the chunks as embedded.
     Attributes:
         chunks_file (str): Path to the input JSONL file containing text chunks.
-        output_file (str): Path to the output JSON file where embedded chunks will be saved.
+        output_file (str): Path to the output JSONL file where embedded chunks will be saved.
         model (SentenceTransformer): The SentenceTransformer model used for embedding.
+        seconds_per_chunk (float or None): Measured embedding time per chunk in the last
+            non-empty `embed_chunks` call.
     Methods:
         load_chunks(): Loads text chunks from the specified JSONL file.
         embed_chunks(chunks): Embeds the loaded chunks and returns those that need embedding.
-        prepare_data_for_vector_store(chunks, embeddings, offset=0): Prepares data for vector store indexing.
+        chunk_id(chunk): Derives a deterministic ID for a chunk from its source and content.
+        prepare_data_for_vector_store(chunks, embeddings): Prepares data for vector store indexing.
         save_embeddings_to_json(data): Saves the embedded data to a JSON file.
         update_processed_chunks_file(): Updates the original chunks file to mark chunks as embedded.
         run_pipeline(): Executes the entire embedding pipeline.
@@ -25,12 +31,13 @@ class Embedder:
     def __init__(
         self,
         chunks_file="./processed_corpus/processed_chunks.jsonl",
-        output_file="./processed_corpus/embedded_chunks.json",
+        output_file="./processed_corpus/embedded_chunks.jsonl",
         model_name="all-MiniLM-L6-v2",
     ):
         self.chunks_file = chunks_file
         self.output_file = output_file
         self.model = SentenceTransformer(model_name)
+        self.seconds_per_chunk = None
 
     def load_chunks(self):
         """
@@ -66,9 +73,12 @@ class Embedder:
             else:
                 already_embedded_count += 1
 
+        start = time.perf_counter()
         embeddings = self.model.encode(
             texts_to_embed, show_progress_bar=True, convert_to_numpy=True
         )
+        if texts_to_embed:
+            self.seconds_per_chunk = (time.perf_counter() - start) / len(texts_to_embed)
         print(f"✅ Embedded {len(texts_to_embed)} chunks")
         if already_embedded_count > 0:
             print(
@@ -76,25 +86,47 @@ class Embedder:
             )
         return chunks_to_embed, embeddings, already_embedded_count
 
-    def prepare_data_for_vector_store(self, chunks, embeddings, offset=0):
+    @staticmethod
+    def chunk_id(chunk):
+        """
+        Derives a deterministic ID for a chunk from its source location and content.
+        The same chunk always maps to the same ID, so re-indexing it overwrites
+        the existing vector instead of colliding with IDs from earlier runs.
+        Args:
+            chunk (dict): A chunk containing 'content' and 'metadata'.
+        Returns:
+            str: The chunk ID, e.g. 'chunk_<sha256 hex>'.
+        """
+        key = "\x1f".join(
+            [
+                str(chunk["metadata"].get("source", "")),
+                str(chunk["metadata"].get("page_slide", "")),
+                chunk["content"],
+            ]
+        )
+        return f"chunk_{hashlib.sha256(key.encode('utf-8')).hexdigest()}"
+
+    def prepare_data_for_vector_store(self, chunks, embeddings):
         """
         Prepares the data for vector store indexing.
         Args:
             chunks (list): List of chunks to be embedded.
             embeddings (np.ndarray): Numpy array of embeddings for the chunks.
-            offset (int, optional): Offset for chunk IDs. Defaults to 0.
         Returns:
             list: A list of dictionaries, each containing 'id', 'embedding', 'document', and 'metadata'.
         """
         data = []
-        for i, (chunk, emb) in enumerate(zip(chunks, embeddings)):
+        for chunk, emb in zip(chunks, embeddings):
             item = {
-                "id": f"chunk_{i + offset}",
+                "id": self.chunk_id(chunk),
                 "embedding": emb.tolist(),
                 "document": chunk["content"],
                 "metadata": chunk["metadata"],
             }
             item["metadata"]["type"] = chunk["type"]
+            item["metadata"]["source_dir"] = os.path.dirname(
+                chunk["metadata"].get("source", "")
+            )
             item["metadata"]["embedded"] = True
             item["metadata"]["saved_to_db"] = False
             data.append(item)
@@ -102,15 +134,38 @@ class Embedder:
 
     def save_embeddings_to_json(self, data):
         """
-        Saves the embedded data to a JSON file.
+        Saves the embedded data to a JSONL file, one item per line, so the indexing
+        step can stream it. Items from an earlier run that were never saved to the
+        vector store are carried over line by line, so an interrupted indexing step
+        can be resumed by simply re-running the pipeline.
         Args:
             data (list): A list of dictionaries containing embedded chunks.
         Returns:
             None
         """
-        with open(self.output_file, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2)
-        print(f"✅ Saved {len(data)} embedded items to {self.output_file}")
+        pending = 0
+        new_ids = {item["id"] for item in data}
+        tmp_path = f"{self.output_file}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as out:
+            if os.path.exists(self.output_file):
+                with open(self.output_file, "r", encoding="utf-8") as f:
+                    for line in f:
+                        if not line.strip():
+                            continue
+                        item = json.loads(line)
+                        if (
+                            not item["metadata"].get("saved_to_db", False)
+                            and item["id"] not in new_ids
+                        ):
+                            out.write(line if line.endswith("\n") else line + "\n")
+                            pending += 1
+            for item in data:
+                out.write(json.dumps(item) + "\n")
+        os.replace(tmp_path, self.output_file)
+        print(
+            f"✅ Saved {len(data)} embedded items to {self.output_file}"
+            + (f" ({pending} pending from an earlier run kept)" if pending else "")
+        )
 
     def update_processed_chunks_file(self):
         """
@@ -148,8 +203,8 @@ class Embedder:
             None
         """
         chunks = self.load_chunks()
-        chunks_to_embed, embeddings, offset = self.embed_chunks(chunks)
-        data = self.prepare_data_for_vector_store(chunks_to_embed, embeddings, offset)
+        chunks_to_embed, embeddings, _ = self.embed_chunks(chunks)
+        data = self.prepare_data_for_vector_store(chunks_to_embed, embeddings)
         self.save_embeddings_to_json(data)
         self.update_processed_chunks_file()
         print("✅ All Embedder operations completed successfully.")
@@ -1,7 +1,16 @@
-import ollama
+import os
+import threading
+from contextlib import nullcontext
+import httpx
+from src.admission import AdmissionController, DeadlineExceededError
+from src.answer_cache import AnswerCache
+from src.reranker import Reranker
 from src.retriever import Retriever
 
 
+OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "http://localhost:11434")
+
+
 class Generator:
     """
     A class for generating answers to user queries using a retrieval-augmented generation (RAG) approach.
@@ -9,11 +18,117 @@ class Generator:
     Args:
         model_name (str, optional): The name of the language model to use. Defaults to "gemma3:latest".
         top_k (int, optional): The number of top relevant chunks to retrieve. Defaults to 10.
+        rerank_top_n (int, optional): If set, rerank the retrieved chunks with a cross-encoder
+            and keep only this many in the prompt. Defaults to None (no reranking).
+        rerank_budget_ms (float, optional): Latency budget for reranking, after which the
+            vector order is used. Defaults to 150.
+        max_concurrency (int, optional): Maximum number of LLM generations running at once. Defaults to 2.
+        max_queue (int, optional): Maximum number of requests waiting for a generation slot
+            before new ones are rejected. Defaults to 8.
+        shared_admission (bool, optional): Share the generation limits with worker processes
+            forked after construction, so they apply to the whole server. Defaults to False.
+        answer_cache_path (str, optional): Path to the precomputed answer cache written by
+            the warm-up job. Set to None to disable. Defaults to "./processed_corpus/answer_cache.json".
+        warm_up (bool, optional): Run the models once at startup. Pre-forked servers pass
+            False and warm up in each worker instead. Defaults to True.
+        **retriever_kwargs: Extra keyword arguments passed to `Retriever`.
     """
 
-    def __init__(self, model_name="gemma3:latest", top_k=10):
+    def __init__(
+        self,
+        model_name="gemma3:latest",
+        top_k=10,
+        rerank_top_n=None,
+        rerank_budget_ms=150,
+        max_concurrency=2,
+        max_queue=8,
+        shared_admission=False,
+        answer_cache_path="./processed_corpus/answer_cache.json",
+        warm_up=True,
+        **retriever_kwargs,
+    ):
         self.model_name = model_name
-        self.retriever = Retriever(top_k=top_k)
+        # One pooled connection to Ollama for all requests; each call passes the time
+        # left on its deadline as the timeout
+        self.ollama = httpx.Client(
+            base_url=OLLAMA_HOST if "://" in OLLAMA_HOST else f"http://{OLLAMA_HOST}"
+        )
+        self.retriever = Retriever(top_k=top_k, **retriever_kwargs)
+        self.reranker = (
+            Reranker(top_n=rerank_top_n, budget_ms=rerank_budget_ms)
+            if rerank_top_n
+            else None
+        )
+        self.prompt_stats = {"requests": 0, "full_chars": 0, "sent_chars": 0}
+        self._stats_lock = threading.Lock()
+        self.admission = AdmissionController(
+            max_concurrency, max_queue, shared=shared_admission
+        )
+        self.answer_cache = AnswerCache(answer_cache_path) if answer_cache_path else None
+        if warm_up:
+            self.warm_up()
+
+    def warm_up(self):
+        """
+        Runs the embedding model, and the reranker if configured, once so the first
+        request does not pay for lazy initialization.
+        """
+        self.retriever.embed_query("warm up")
+        if self.reranker is not None:
+            self.reranker.warm_up()
+
+    def select_context(self, query, retrieved_chunks):
+        """
+        Narrows the retrieved chunks to those sent to the language model, reranking them
+        if a reranker is configured, and records how much this shrinks the prompt.
+        Args:
+            query (str): The user's question.
+            retrieved_chunks (list): Retrieved chunks in vector-similarity order.
+        Returns:
+            list: The chunks to include in the prompt.
+        """
+        if self.reranker is None:
+            return retrieved_chunks
+
+        selected = self.reranker.rerank(query, retrieved_chunks)
+        # The rest of the prompt is the same either way, so compare the context only
+        full_chars = self.context_chars(retrieved_chunks)
+        sent_chars = self.context_chars(selected)
+        with self._stats_lock:
+            self.prompt_stats["requests"] += 1
+            self.prompt_stats["full_chars"] += full_chars
+            self.prompt_stats["sent_chars"] += sent_chars
+            requests = self.prompt_stats["requests"]
+            saved = 1 - self.prompt_stats["sent_chars"] / max(
+                self.prompt_stats["full_chars"], 1
+            )
+        print(
+            f"✂️ Context {full_chars} -> {sent_chars} chars; "
+            f"{saved:.0%} smaller on average over {requests} requests"
+        )
+        return selected
+
+    @staticmethod
+    def format_chunk(chunk):
+        """
+        Formats one chunk for the prompt's context section.
+        Args:
+            chunk (dict): A retrieved chunk containing 'document' and 'metadata'.
+        Returns:
+            str: The chunk with its source header.
+        """
+        return f"[{chunk['metadata'].get('source', '')} - {chunk['metadata'].get('page_slide', '')}]\n{chunk['document']}"
+
+    def context_chars(self, chunks):
+        """
+        Returns the length of the context section `build_prompt` would produce.
+        Args:
+            chunks (list): Chunks to include.
+        Returns:
+            int: Number of characters.
+        """
+        separators = 2 * (len(chunks) - 1) if chunks else 0
+        return sum(len(self.format_chunk(chunk)) for chunk in chunks) + separators
 
     def build_prompt(self, query, retrieved_chunks):
         """
@@ -25,8 +140,7 @@ class Generator:
             str: The constructed prompt for the language model.
         """
         context_texts = "\n\n".join(
-            f"[{chunk['metadata'].get('source', '')} - {chunk['metadata'].get('page_slide', '')}]\n{chunk['document']}"
-            for chunk in retrieved_chunks
+            self.format_chunk(chunk) for chunk in retrieved_chunks
         )
 
         return f"""You are a helpful technical interview tutor.
@@ -40,22 +154,90 @@ Question: {query}
 Answer in a clear, concise, and beginner-friendly way.
 """
 
-    def generate_answer(self, query):
+    def collection_version(self):
+        """
+        Returns the version of the index answers are computed against.
+        Returns:
+            str: The name of the served vector store snapshot, or "base" before the first one.
+        """
+        return self.retriever.snapshot or "base"
+
+    def generate_answer(self, query, where=None, deadline=None):
         """
         Generates an answer to the user's query using retrieved context and the language model.
+        Unfiltered questions are first looked up in the precomputed answer cache.
+        The request takes its admission slot before retrieval, so a full queue is
+        rejected before any embedding, retrieval or reranking work is spent on it. If
+        a deadline is given, each stage checks it first and the LLM call is bounded by
+        the time left, so work for requests that have timed out is dropped.
+        Args:
+            query (str): The user's question.
+            where (dict, optional): A metadata filter restricting retrieval, e.g. {"type": "table"}.
+            deadline (Deadline, optional): The request deadline.
+        Returns:
+            str: The generated answer from the language model.
+        Raises:
+            QueueFullError: If the generation queue is full.
+            DeadlineExceededError: If the deadline passes before the answer is generated.
+        """
+        use_cache = self.answer_cache is not None and not where
+        version = self.collection_version()
+        if use_cache:
+            answer = self.answer_cache.lookup(query, version)
+            if answer is not None:
+                self.answer_cache.record(hit=True)
+                return answer
+
+        with self.admission.admit(deadline):
+            if deadline is not None:
+                deadline.check("retrieval")
+            retrieved_chunks = self.retriever.retrieve_top_k(query, where=where)
+
+            if use_cache:
+                answer = self.answer_cache.revalidate(
+                    query, version, [chunk["id"] for chunk in retrieved_chunks]
+                )
+                self.answer_cache.record(hit=answer is not None)
+                if answer is not None:
+                    return answer
+
+            return self.answer_from_chunks(
+                query, retrieved_chunks, deadline, admitted=True
+            )
+
+    def answer_from_chunks(self, query, retrieved_chunks, deadline=None, admitted=False):
+        """
+        Generates an answer from already retrieved chunks.
         Args:
             query (str): The user's question.
+            retrieved_chunks (list): Chunks returned by the retriever.
+            deadline (Deadline, optional): The request deadline. The LLM call is given
+                only the time left and raises once it runs out.
+            admitted (bool, optional): The caller already holds an admission slot.
+                Defaults to False.
         Returns:
             str: The generated answer from the language model.
+        Raises:
+            DeadlineExceededError: If the deadline passes before the answer is generated.
         """
-        retrieved_chunks = self.retriever.retrieve_top_k(query)
+        retrieved_chunks = self.select_context(query, retrieved_chunks)
         prompt = self.build_prompt(query, retrieved_chunks)
+        messages = [{"role": "user", "content": prompt}]
 
-        response = ollama.chat(
-            model=self.model_name, messages=[{"role": "user", "content": prompt}]
-        )
+        with nullcontext() if admitted else self.admission.admit(deadline):
+            if deadline is not None:
+                deadline.check("generation")
+            try:
+                response = self.ollama.post(
+                    "/api/chat",
+                    json={"model": self.model_name, "messages": messages, "stream": False},
+                    timeout=deadline.remaining() if deadline is not None else None,
+                )
+            except httpx.TimeoutException:
+                raise DeadlineExceededError("Deadline exceeded during generation")
+            response.raise_for_status()
 
-        return response["message"]["content"]
+        return response.json()["message"]["content"]
 
     def run(self):
         """
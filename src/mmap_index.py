@@ -0,0 +1,246 @@
+import os
+import json
+import shutil
+import chromadb
+import numpy as np
+from src.sharding import ShardRouter
+
+
+class MmapIndex:
+    """
+    A read-only, memory-mapped copy of a vector store snapshot for brute-force search.
+    Embeddings and document text live in flat files opened with `mmap`, so every process
+    that opens the same index shares one copy through the OS page cache instead of each
+    holding its own. Distances are squared L2, matching ChromaDB's default, so results
+    rank the same as a `collection.query`.
+    Attributes:
+        index_dir (str): Directory containing the index files.
+        embeddings (np.memmap): Matrix of shape (n, dim) of float32 embeddings.
+        norms (np.memmap): Squared L2 norm of each embedding.
+        ids (list): Chunk IDs in row order.
+        metadatas (list): Chunk metadata in row order.
+    Methods:
+        export(vector_store_path): Exports a snapshot into its `mmap_index` directory.
+        build(client, collection_names, index_dir): Exports collections into a new index.
+        query(query_embedding, top_k, where=None): Returns the nearest rows.
+    """
+
+    EMBEDDINGS_FILE = "embeddings.npy"
+    NORMS_FILE = "norms.npy"
+    DOCUMENTS_FILE = "documents.bin"
+    OFFSETS_FILE = "offsets.npy"
+    ROWS_FILE = "rows.json"
+    INDEX_DIR = "mmap_index"
+
+    def __init__(self, index_dir):
+        self.index_dir = index_dir
+        self.embeddings = np.load(
+            os.path.join(index_dir, self.EMBEDDINGS_FILE), mmap_mode="r"
+        )
+        self.norms = np.load(os.path.join(index_dir, self.NORMS_FILE), mmap_mode="r")
+        self.offsets = np.load(os.path.join(index_dir, self.OFFSETS_FILE), mmap_mode="r")
+        documents_path = os.path.join(index_dir, self.DOCUMENTS_FILE)
+        self.documents = (
+            np.memmap(documents_path, dtype=np.uint8, mode="r")
+            if os.path.getsize(documents_path)
+            else np.zeros(0, dtype=np.uint8)
+        )
+        with open(os.path.join(index_dir, self.ROWS_FILE), "r", encoding="utf-8") as f:
+            rows = json.load(f)
+        self.ids = rows["ids"]
+        self.metadatas = rows["metadatas"]
+
+    @classmethod
+    def export(cls, vector_store_path, collection_name="interview-prep"):
+        """
+        Exports every collection of a vector store (or snapshot) into its `mmap_index`
+        directory. Done once per snapshot by whoever publishes it, so serving processes
+        only ever open the result. The ChromaDB client for the path is released
+        afterwards, so callers must be done writing to it.
+        Args:
+            vector_store_path (str): Directory of the snapshot to export.
+            collection_name (str, optional): Base collection name. Defaults to "interview-prep".
+        Returns:
+            None
+        """
+        # Imported here: src.vector_store imports src.snapshots, which imports this module
+        from src.vector_store import release_client
+
+        client = chromadb.PersistentClient(path=vector_store_path)
+        router = ShardRouter(vector_store_path, collection_name)
+        try:
+            cls.build(
+                client,
+                router.all_collections(),
+                os.path.join(vector_store_path, cls.INDEX_DIR),
+            )
+        finally:
+            release_client(vector_store_path)
+
+    @classmethod
+    def build(cls, client, collection_names, index_dir, page_size=1000):
+        """
+        Exports the given collections into a memory-mappable index directory.
+        The index is written to a temporary directory and renamed into place, replacing
+        any earlier export, so readers never see a partial index.
+        Args:
+            client (chromadb.PersistentClient): Client for the snapshot to export.
+            collection_names (list): Collections to include.
+            index_dir (str): Destination directory.
+            page_size (int, optional): Rows fetched per `collection.get` call. Defaults to 1000.
+        Returns:
+            int: Number of exported vectors.
+        """
+        tmp_dir = f"{index_dir}.tmp-{os.getpid()}"
+        os.makedirs(tmp_dir, exist_ok=True)
+        ids, metadatas, embeddings, offsets = [], [], [], [0]
+
+        with open(os.path.join(tmp_dir, cls.DOCUMENTS_FILE), "wb") as docs:
+            for name in collection_names:
+                collection = client.get_or_create_collection(name=name)
+                offset = 0
+                while True:
+                    page = collection.get(
+                        include=["embeddings", "documents", "metadatas"],
+                        limit=page_size,
+                        offset=offset,
+                    )
+                    if not page["ids"]:
+                        break
+                    for row_id, emb, doc, meta in zip(
+                        page["ids"],
+                        page["embeddings"],
+                        page["documents"],
+                        page["metadatas"],
+                    ):
+                        encoded = (doc or "").encode("utf-8")
+                        docs.write(encoded)
+                        offsets.append(offsets[-1] + len(encoded))
+                        ids.append(row_id)
+                        metadatas.append(meta or {})
+                        embeddings.append(emb)
+                    offset += len(page["ids"])
+
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        if matrix.ndim != 2:
+            matrix = matrix.reshape(0, 0)
+        np.save(os.path.join(tmp_dir, cls.EMBEDDINGS_FILE), matrix)
+        np.save(
+            os.path.join(tmp_dir, cls.NORMS_FILE),
+            np.einsum("ij,ij->i", matrix, matrix),
+        )
+        np.save(
+            os.path.join(tmp_dir, cls.OFFSETS_FILE), np.asarray(offsets, dtype=np.int64)
+        )
+        with open(os.path.join(tmp_dir, cls.ROWS_FILE), "w", encoding="utf-8") as f:
+            json.dump({"ids": ids, "metadatas": metadatas}, f)
+
+        if os.path.isdir(index_dir):
+            shutil.rmtree(index_dir)
+        os.rename(tmp_dir, index_dir)
+        print(f"✅ Exported {len(ids)} vectors to memory-mapped index {index_dir}")
+        return len(ids)
+
+    def document(self, row):
+        """
+        Decodes the document text for a row from the memory-mapped text file.
+        Args:
+            row (int): Row number.
+        Returns:
+            str: The document text.
+        """
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        return bytes(self.documents[start:end]).decode("utf-8")
+
+    def query(self, query_embedding, top_k, where=None):
+        """
+        Returns the `top_k` rows nearest to the query, optionally filtered by metadata.
+        Args:
+            query_embedding (list): The embedded query.
+            top_k (int): Number of results to return.
+            where (dict, optional): A ChromaDB-style `where` filter.
+        Returns:
+            list: A list of dictionaries, each containing 'id', 'document', 'metadata', and 'distance' for a result.
+        """
+        if not self.ids:
+            return []
+        q = np.asarray(query_embedding, dtype=np.float32)
+        distances = self.norms - 2 * (self.embeddings @ q) + q @ q
+
+        if where:
+            mask = np.fromiter(
+                (_matches(meta, where) for meta in self.metadatas),
+                dtype=bool,
+                count=len(self.metadatas),
+            )
+            distances = np.where(mask, distances, np.inf)
+
+        k = min(top_k, len(self.ids))
+        nearest = np.argpartition(distances, k - 1)[:k]
+        nearest = nearest[np.argsort(distances[nearest])]
+        return [
+            {
+                "id": self.ids[row],
+                "document": self.document(row),
+                "metadata": self.metadatas[row],
+                "distance": float(distances[row]),
+            }
+            for row in nearest
+            if np.isfinite(distances[row])
+        ]
+
+
+def _matches(metadata, where):
+    """
+    Evaluates a ChromaDB-style `where` filter against one row's metadata.
+    Args:
+        metadata (dict): The row metadata.
+        where (dict): The filter.
+    Returns:
+        bool: True if the row matches.
+    Raises:
+        ValueError: If the filter uses an operator this index does not support.
+    """
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(_matches(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(_matches(metadata, clause) for clause in condition):
+                return False
+        elif key.startswith("$"):
+            raise ValueError(f"Unsupported operator {key}")
+        else:
+            value = metadata.get(key)
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            for op, operand in condition.items():
+                if op not in _OPERATORS:
+                    raise ValueError(f"Unsupported operator {op} on '{key}'")
+                if not _OPERATORS[op](value, operand):
+                    return False
+    return True
+
+
+def _compare(compare):
+    # Range operators only match numeric metadata, like ChromaDB
+    def matches(value, operand):
+        return (
+            isinstance(value, (int, float))
+            and not isinstance(value, bool)
+            and compare(value, operand)
+        )
+
+    return matches
+
+
+_OPERATORS = {
+    "$eq": lambda value, operand: value == operand,
+    "$ne": lambda value, operand: value != operand,
+    "$in": lambda value, operand: value in operand,
+    "$nin": lambda value, operand: value not in operand,
+    "$gt": _compare(lambda value, operand: value > operand),
+    "$gte": _compare(lambda value, operand: value >= operand),
+    "$lt": _compare(lambda value, operand: value < operand),
+    "$lte": _compare(lambda value, operand: value <= operand),
+}
@@ -0,0 +1,158 @@
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from sentence_transformers import CrossEncoder
+
+
+class Reranker:
+    """
+    A latency-budgeted cross-encoder reranking stage between retrieval and prompt building.
+    All uncached (query, chunk) pairs are scored in a single batch. If scoring does not
+    finish within the budget, the chunks are returned in their original vector order so
+    a slow CPU never holds up the answer. A timed-out batch that has not started yet is
+    cancelled; one that is already running finishes in the background and its scores are
+    cached, and while it runs new requests skip scoring rather than queue behind it.
+    Scores are cached per (query hash, chunk id).
+    Attributes:
+        model (CrossEncoder): The cross-encoder used to score (query, chunk) pairs.
+        top_n (int): Number of chunks to keep after reranking.
+        budget_ms (float): Hard latency budget for scoring, in milliseconds.
+        cache_size (int): Maximum number of cached scores.
+        stats (dict): Counters for reranked, fallback, cached and busy-skipped calls.
+    Args:
+        model_name (str, optional): Name of the CrossEncoder model. Defaults to "cross-encoder/ms-marco-MiniLM-L-6-v2".
+        top_n (int, optional): Number of chunks to keep. Defaults to 3.
+        budget_ms (float, optional): Latency budget in milliseconds. Defaults to 150.
+        cache_size (int, optional): Maximum number of cached scores. Defaults to 10000.
+    """
+
+    def __init__(
+        self,
+        model_name="cross-encoder/ms-marco-MiniLM-L-6-v2",
+        top_n=3,
+        budget_ms=150,
+        cache_size=10000,
+    ):
+        self.model = CrossEncoder(model_name)
+        self.top_n = top_n
+        self.budget_ms = budget_ms
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.stats = {"reranked": 0, "fallback": 0, "fully_cached": 0, "skipped_busy": 0}
+        self._lock = threading.Lock()
+        self._late = set()
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="reranker")
+
+    def warm_up(self):
+        """
+        Runs one prediction so the first real request is not charged for lazy
+        initialization and counted against the latency budget.
+        """
+        self.model.predict([("warm up", "warm up")])
+
+    def _cache_key(self, query, chunk_id):
+        return (hashlib.sha256(query.encode("utf-8")).hexdigest(), chunk_id)
+
+    def _cache_get(self, key):
+        with self._lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                return self.cache[key]
+        return None
+
+    def _count(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def _cache_put(self, key, score):
+        with self._lock:
+            self.cache[key] = score
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    def score(self, query, chunks):
+        """
+        Scores each chunk against the query, using cached scores where available.
+        Args:
+            query (str): The user's question.
+            chunks (list): Retrieved chunks, each containing 'id' and 'document'.
+        Returns:
+            list: One relevance score per chunk, or None if the budget was exceeded or
+                a timed-out batch is still occupying the scorer.
+        """
+        keys = [self._cache_key(query, chunk["id"]) for chunk in chunks]
+        scores = [self._cache_get(key) for key in keys]
+        missing = [i for i, s in enumerate(scores) if s is None]
+        if not missing:
+            self._count("fully_cached")
+            return scores
+
+        with self._lock:
+            busy = bool(self._late)
+        if busy:
+            self._count("skipped_busy")
+            print("⏭️ Reranker busy finishing a late batch, using vector order.")
+            return None
+
+        pairs = [(query, chunks[i]["document"]) for i in missing]
+        future = self._pool.submit(self.model.predict, pairs)
+        try:
+            predicted = future.result(timeout=self.budget_ms / 1000)
+        except TimeoutError:
+            self._count("fallback")
+            print(f"⚠️ Rerank exceeded {self.budget_ms}ms budget, using vector order.")
+            # A batch still queued behind another is dropped outright
+            if future.cancel():
+                return None
+
+            # The running batch finishes in the background so its scores still get cached
+            def store_late(f):
+                with self._lock:
+                    self._late.discard(f)
+                if f.exception() is None:
+                    self._store(keys, missing, f.result())
+
+            with self._lock:
+                self._late.add(future)
+            future.add_done_callback(store_late)
+            return None
+
+        self._store(keys, missing, predicted)
+        for i, s in zip(missing, predicted):
+            scores[i] = float(s)
+        return scores
+
+    def _store(self, keys, missing, predicted):
+        for i, s in zip(missing, predicted):
+            self._cache_put(keys[i], float(s))
+
+    def rerank(self, query, chunks, top_n=None):
+        """
+        Reorders chunks by cross-encoder score and keeps the best `top_n`.
+        Falls back to the original vector order when the latency budget is exceeded or
+        the scorer is busy.
+        Args:
+            query (str): The user's question.
+            chunks (list): Retrieved chunks in vector-similarity order.
+            top_n (int, optional): Number of chunks to keep. If None, uses the default top_n.
+        Returns:
+            list: The selected chunks, each with a 'rerank_score' when reranking succeeded.
+        """
+        if top_n is None:
+            top_n = self.top_n
+        if len(chunks) <= 1:
+            return chunks[:top_n]
+
+        start = time.perf_counter()
+        scores = self.score(query, chunks)
+        if scores is None:
+            return chunks[:top_n]
+
+        self._count("reranked")
+        ranked = sorted(zip(scores, chunks), key=lambda pair: pair[0], reverse=True)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        print(f"🔀 Reranked {len(chunks)} chunks in {elapsed_ms:.0f}ms")
+        return [dict(chunk, rerank_score=score) for score, chunk in ranked[:top_n]]
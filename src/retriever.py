@@ -1,5 +1,13 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import chromadb
 from sentence_transformers import SentenceTransformer
+from src.mmap_index import MmapIndex
+from src.sharding import ShardRouter, validate_where
+from src.snapshots import SnapshotManager
+from src.vector_store import release_client
 
 
 class Retriever:
@@ -11,7 +19,9 @@ class Retriever:
         top_k (int): Default number of top results to retrieve.
         model (SentenceTransformer): The embedding model used for queries.
         client (chromadb.PersistentClient): The persistent ChromaDB client.
-        collection (chromadb.Collection): The collection within the vector store.
+        index (tuple): The (ShardRouter, {name: chromadb.Collection}, MmapIndex or None) for the served snapshot.
+        snapshot (str): Name of the vector store snapshot currently being served.
+        last_ingestion_lag (float): Seconds from the most recent corpus change to it being searchable.
 
         Initializes the Retriever with a vector store, collection, and embedding model.
 
@@ -20,6 +30,14 @@ class Retriever:
         collection_name (str, optional): Name of the collection in the vector store. Defaults to "interview-prep".
         model_name (str, optional): Name of the SentenceTransformer model to use. Defaults to "all-MiniLM-L6-v2".
         top_k (int, optional): Default number of top results to retrieve. Defaults to 10.
+        snapshot_poll_interval (float, optional): Seconds between checks for a newly published
+            snapshot. Set to None to disable hot swapping. Defaults to 2.0.
+        release_grace_seconds (float, optional): How long the previous snapshot's client is
+            kept open after a swap so in-flight queries can finish. Defaults to 30.
+        max_workers (int, optional): Number of threads used to search shards in parallel. Defaults to 4.
+        use_mmap_index (bool, optional): Search a memory-mapped export of the snapshot instead of
+            querying ChromaDB, so forked workers share one copy of the index. The export is
+            written when the snapshot is published (see `SnapshotManager`). Defaults to False.
     """
 
     def __init__(
@@ -28,11 +46,110 @@ class Retriever:
         collection_name="interview-prep",
         model_name="all-MiniLM-L6-v2",
         top_k=10,
+        snapshot_poll_interval=2.0,
+        release_grace_seconds=30,
+        max_workers=4,
+        use_mmap_index=False,
     ):
         self.top_k = top_k
+        self.collection_name = collection_name
         self.model = SentenceTransformer(model_name)
-        self.client = chromadb.PersistentClient(path=vector_store_path)
-        self.collection = self.client.get_or_create_collection(name=collection_name)
+        self.snapshots = SnapshotManager(vector_store_path)
+        self.snapshot = None
+        self.last_ingestion_lag = None
+        self.client = None
+        self.client_path = None
+        self.release_grace_seconds = release_grace_seconds
+        self.index = None
+        self.use_mmap_index = use_mmap_index
+        self.pool = ThreadPoolExecutor(max_workers=max_workers)
+        self.refresh_snapshot()
+
+        if snapshot_poll_interval:
+            self.start_snapshot_polling(snapshot_poll_interval)
+
+    def start_snapshot_polling(self, interval):
+        """
+        Starts a daemon thread that checks for newly published snapshots. Threads do not
+        survive `fork`, so pre-forked workers call this after forking.
+        Args:
+            interval (float): Seconds between checks.
+        Returns:
+            threading.Thread: The started thread.
+        """
+        thread = threading.Thread(
+            target=self._poll_snapshots,
+            args=(interval,),
+            name="snapshot-poller",
+            daemon=True,
+        )
+        thread.start()
+        return thread
+
+    def refresh_snapshot(self):
+        """
+        Switches to the latest published vector store snapshot if it has changed.
+        The new client and shard collections are opened before the swap, and queries
+        already running keep their reference to the old index, so nothing is blocked.
+        With `use_mmap_index`, the snapshot's memory-mapped export is opened instead and
+        no ChromaDB client is created; snapshots published without one are queried
+        through ChromaDB.
+        Returns:
+            bool: True if a new snapshot was loaded.
+        """
+        pointer = self.snapshots.read_pointer()
+        snapshot = pointer["snapshot"] if pointer else None
+        if self.index is not None and snapshot == self.snapshot:
+            return False
+
+        swapping = self.index is not None
+        path = self.snapshots.current_path()
+        router = ShardRouter(path, self.collection_name)
+        index_dir = os.path.join(path, MmapIndex.INDEX_DIR)
+        if self.use_mmap_index and os.path.isdir(index_dir):
+            client, collections = None, {}
+            mmap_index = MmapIndex(index_dir)
+        else:
+            if self.use_mmap_index:
+                print(
+                    f"⚠️ Snapshot {snapshot} has no memory-mapped index, querying ChromaDB."
+                )
+            client = chromadb.PersistentClient(path=path)
+            collections = {
+                name: client.get_or_create_collection(name=name)
+                for name in router.all_collections()
+            }
+            mmap_index = None
+        old_client_path = self.client_path
+        self.client, self.snapshot = client, snapshot
+        self.client_path = path if client is not None else None
+        self.index = (router, collections, mmap_index)
+        if swapping and old_client_path not in (None, path):
+            # Chroma caches a client per path for the life of the process; release
+            # the old one once queries that started on it have had time to finish
+            timer = threading.Timer(
+                self.release_grace_seconds, release_client, args=(old_client_path,)
+            )
+            timer.daemon = True
+            timer.start()
+
+        if swapping and pointer.get("changes"):
+            now = time.time()
+            self.last_ingestion_lag = max(
+                now - changed_at for changed_at in pointer["changes"].values()
+            )
+            print(
+                f"🔄 Switched to snapshot {snapshot}, ingestion lag {self.last_ingestion_lag:.1f}s"
+            )
+        return True
+
+    def _poll_snapshots(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.refresh_snapshot()
+            except Exception as e:
+                print(f"Error refreshing snapshot: {e}")
 
     def embed_query(self, query: str):
         """
@@ -44,20 +161,19 @@ class Retriever:
         """
         return self.model.encode(query, convert_to_numpy=True).tolist()
 
-    def retrieve_top_k(self, query: str, top_k=None):
+    def query_collection(self, collection, query_embedding, top_k, where=None):
         """
-        Retrieves the top-k most relevant documents for a given query.
+        Queries a single shard collection.
         Args:
-            query (str): The input query string.
-            top_k (int, optional): Number of top results to retrieve. If None, uses the default top_k.
+            collection (chromadb.Collection): The shard to search.
+            query_embedding (list): The embedded query.
+            top_k (int): Number of results to return from this shard.
+            where (dict, optional): A ChromaDB `where` filter applied inside the shard.
         Returns:
             list: A list of dictionaries, each containing 'id', 'document', 'metadata', and 'distance' for a result.
         """
-        if top_k is None:
-            top_k = self.top_k
-        query_embedding = self.embed_query(query)
-        results = self.collection.query(
-            query_embeddings=[query_embedding], n_results=top_k
+        results = collection.query(
+            query_embeddings=[query_embedding], n_results=top_k, where=where or None
         )
         retrieved = []
         for i in range(len(results["ids"][0])):
@@ -71,6 +187,48 @@ class Retriever:
             )
         return retrieved
 
+    def retrieve_top_k(self, query: str, top_k=None, where=None):
+        """
+        Retrieves the top-k most relevant documents for a given query.
+        Only the shards that can satisfy `where` are searched, in parallel, and the
+        filter is pushed down so non-matching rows are never scored.
+        Args:
+            query (str): The input query string.
+            top_k (int, optional): Number of top results to retrieve. If None, uses the default top_k.
+            where (dict, optional): A ChromaDB metadata filter, e.g. {"type": "table"}.
+        Returns:
+            list: A list of dictionaries, each containing 'id', 'document', 'metadata', and 'distance' for a result.
+        Raises:
+            ValueError: If `where` is not a valid filter.
+        """
+        if where:
+            validate_where(where)
+        if top_k is None:
+            top_k = self.top_k
+        router, collections, mmap_index = self.index
+        if mmap_index is not None:
+            return mmap_index.query(self.embed_query(query), top_k, where)
+
+        names = router.select_collections(where)
+        if not names:
+            return []
+
+        query_embedding = self.embed_query(query)
+        if len(names) == 1:
+            return self.query_collection(
+                collections[names[0]], query_embedding, top_k, where
+            )
+
+        futures = [
+            self.pool.submit(
+                self.query_collection, collections[name], query_embedding, top_k, where
+            )
+            for name in names
+        ]
+        merged = [result for future in futures for result in future.result()]
+        merged.sort(key=lambda r: r["distance"])
+        return merged[:top_k]
+
     def run_query(self):
         """
         Prompts the user for a query, retrieves the top-k relevant documents, and prints them.
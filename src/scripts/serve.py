@@ -0,0 +1,181 @@
+import gc
+import os
+import time
+import signal
+import socket
+
+HOST = "0.0.0.0"
+PORT = 8000
+RSS_REPORT_INTERVAL = 30
+
+
+def unique_rss_kb(pid):
+    """
+    Returns the unique set size (memory not shared with any other process) of a process.
+    Args:
+        pid (int): Process ID.
+    Returns:
+        int or None: Private_Clean + Private_Dirty in kB, or None if unavailable.
+    """
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+    except OSError:
+        return None
+    return sum(
+        int(fields[key].split()[0])
+        for key in ("Private_Clean", "Private_Dirty")
+        if key in fields
+    )
+
+
+def report_rss(worker_pids):
+    """
+    Prints the unique RSS of the parent and each worker.
+    Args:
+        worker_pids (list): PIDs of the forked workers.
+    """
+    parent = unique_rss_kb(os.getpid())
+    workers = [unique_rss_kb(pid) for pid in worker_pids]
+    sizes = ", ".join(
+        f"{pid}: {kb / 1024:.0f} MiB" for pid, kb in zip(worker_pids, workers) if kb
+    )
+    if parent is not None:
+        print(f"📊 Unique RSS parent {parent / 1024:.0f} MiB; workers {sizes}")
+
+
+def run_worker(index, sock, cpus, threads_per_worker, snapshot_poll_interval):
+    """
+    Entry point of a forked worker: pins it to its CPU slice, restarts the threads that
+    did not survive the fork, and serves the shared app on the inherited socket.
+    """
+    import torch
+    import uvicorn
+    from src import app_backend
+
+    if cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+    torch.set_num_threads(threads_per_worker)
+
+    generator = app_backend.generator
+    if snapshot_poll_interval:
+        generator.retriever.start_snapshot_polling(snapshot_poll_interval)
+    generator.warm_up()
+    print(f"👷 Worker {index} (pid {os.getpid()}) on CPUs {sorted(cpus)}")
+
+    server = uvicorn.Server(uvicorn.Config(app_backend.app, log_level="info"))
+    server.run(sockets=[sock])
+
+
+def serve(
+    host=HOST,
+    port=PORT,
+    workers=None,
+    threads_per_worker=None,
+    snapshot_poll_interval=2.0,
+    **generator_kwargs,
+):
+    """
+    Serves the backend with several pre-forked uvicorn workers that share one copy of
+    the model weights and the memory-mapped index.
+    The parent loads the Generator and the index once and then forks; workers inherit
+    them copy-on-write, so only per-request state is private to each worker. Each worker
+    is pinned to its own slice of CPUs with a matching torch thread count so workers
+    do not oversubscribe the machine.
+    Args:
+        host (str, optional): Interface to bind. Defaults to "0.0.0.0".
+        port (int, optional): Port to bind. Defaults to 8000.
+        workers (int, optional): Number of workers. Defaults to one per `threads_per_worker` CPUs.
+        threads_per_worker (int, optional): Torch threads per worker. Defaults to CPUs / workers.
+        snapshot_poll_interval (float, optional): Passed to each worker's Retriever. Defaults to 2.0.
+        **generator_kwargs: Extra keyword arguments passed to `Generator`.
+    """
+    cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else []
+    cpu_count = len(cpus) or os.cpu_count() or 1
+    if workers is None:
+        workers = max(1, cpu_count // (threads_per_worker or 2))
+    if threads_per_worker is None:
+        threads_per_worker = max(1, cpu_count // workers)
+
+    # Thread pools are sized when torch is first imported, so set the limits first
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads_per_worker)
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+
+    from src import app_backend
+    from src.generator import Generator
+    from src.mmap_index import MmapIndex
+    from src.snapshots import SnapshotManager
+
+    # Export the live snapshot once here if its publisher did not, so workers never
+    # open ChromaDB or build the index themselves
+    snapshot_path = SnapshotManager().current_path()
+    if not os.path.isdir(os.path.join(snapshot_path, MmapIndex.INDEX_DIR)):
+        MmapIndex.export(snapshot_path)
+
+    # Inference must not run in the parent: OpenMP thread pools are not fork-safe
+    app_backend.generator = Generator(
+        warm_up=False,
+        snapshot_poll_interval=None,
+        use_mmap_index=True,
+        # One set of generation slots and one queue for all workers, not one per worker
+        shared_admission=True,
+        **generator_kwargs,
+    )
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    # Move everything loaded so far out of the collector's reach so GC passes in the
+    # workers do not touch (and copy) the shared pages
+    gc.collect()
+    gc.freeze()
+
+    worker_pids = []
+    for index in range(workers):
+        worker_cpus = set(cpus[index::workers]) if cpus else set()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                run_worker(
+                    index, sock, worker_cpus, threads_per_worker, snapshot_poll_interval
+                )
+            finally:
+                os._exit(0)
+        worker_pids.append(pid)
+
+    print(
+        f"🚀 Serving on http://{host}:{port} with {workers} workers x {threads_per_worker} threads"
+    )
+
+    def shutdown(signum, frame):
+        for pid in worker_pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    alive = set(worker_pids)
+    last_report = 0.0
+    while alive:
+        try:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid:
+            alive.discard(pid)
+            continue
+        if time.monotonic() - last_report >= RSS_REPORT_INTERVAL:
+            report_rss(sorted(alive))
+            last_report = time.monotonic()
+        time.sleep(1)
+
+
+if __name__ == "__main__":
+    serve()
@@ -1,25 +1,54 @@
+from src.config import load_config
 from src.data_loader import DataLoader
+from src.deduplicator import Deduplicator
 from src.embedder import Embedder
-from src.vector_store import VectorStoreManager
+from src.snapshots import SnapshotManager
+from src.vector_store import VectorStoreManager, count_pending_items
 
 
 def update_pipeline():
     print("🚀 Starting update pipeline...")
+    config = load_config()
 
     # Step 1: Load and process any new files from corpus
     print("📂 Loading and processing new files from corpus...")
     loader = DataLoader()
-    loader.run_pipeline()
+    deduplicator = Deduplicator()
+    loader.run_pipeline(deduplicator=deduplicator)
 
     # Step 2: Embed unembedded chunks
     print("🔍 Embedding unembedded chunks...")
     embedder = Embedder()
     embedder.run_pipeline()
+    deduplicator.report(seconds_per_chunk=embedder.seconds_per_chunk)
+
+    # Step 3: Add new embeddings to a fresh snapshot so the serving process
+    # keeps reading the current one until the new snapshot is published. A run with
+    # nothing to change keeps the live snapshot, so readers do not swap and cached
+    # answers stay on the current version
+    if not count_pending_items() and not deduplicator.location_updates:
+        print("✅ Nothing new to index, keeping the current snapshot.")
+        return
 
-    # Step 3: Add new embeddings to vector store
     print("🗃️ Adding new embeddings to vector store...")
-    vector_store_manager = VectorStoreManager()
-    vector_store_manager.run_pipeline()
+    snapshots = SnapshotManager(export_mmap_index=config.get("mmap_index", False))
+    snapshot_path = snapshots.prepare(resume=True)
+    vector_store_manager = VectorStoreManager(
+        vector_store_path=snapshot_path, shard_key=config.get("shard_key")
+    )
+
+    def publish():
+        vector_store_manager.update_metadata(deduplicator.location_updates)
+        snapshots.publish(snapshot_path)
+
+    # Items are only flagged as saved once the snapshot holding them is live; an
+    # interrupted run resumes into the same unpublished snapshot
+    vector_store_manager.run_pipeline(publish=publish)
+
+    # Location updates were persisted with the LSH index in step 1 so a failure
+    # above keeps them for the next run; they can be dropped now they are live
+    deduplicator.location_updates = {}
+    deduplicator.save()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,135 @@
+import os
+import sys
+import json
+import time
+from collections import Counter
+import requests
+from src.answer_cache import AnswerCache
+
+REQUEST_LOG = "./processed_corpus/request_log.jsonl"
+METRICS_URL = "http://localhost:8000/metrics"
+TOP_N = 100
+
+
+def load_questions(questions_file=None, request_log=REQUEST_LOG, top_n=TOP_N):
+    """
+    Loads the questions to warm, either from a file (one question per line) or as the
+    most frequent questions in the backend's request log.
+    Args:
+        questions_file (str, optional): Path to a question list.
+        request_log (str, optional): Path to the backend request log; its rotated
+            predecessor (`<request_log>.1`) is read too.
+        top_n (int, optional): Number of most frequent logged questions to use.
+    Returns:
+        list: The questions, most important first.
+    """
+    if questions_file:
+        with open(questions_file, "r", encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip()]
+
+    counts = Counter()
+    # Include the rotated log so a recent rotation does not reset the counts
+    for path in (f"{request_log}.1", request_log):
+        if not os.path.exists(path):
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    query = json.loads(line)["query"]
+                except (ValueError, KeyError):
+                    continue
+                counts[AnswerCache.normalize(query)] += 1
+    return [query for query, _ in counts.most_common(top_n)]
+
+
+class CacheWarmer:
+    """
+    Precomputes answers for a question list at low priority so the first live request
+    for a common question is served from the answer cache.
+    Questions whose cached entry is for the current collection version are skipped, and
+    those whose retrieved chunks are unchanged since the last run are carried over to the
+    new version without calling the LLM; only the rest are regenerated. Before each
+    generation the warmer waits until the backend's generation queue is idle.
+    Args:
+        generator (Generator): Generator used for retrieval and generation.
+        metrics_url (str, optional): Backend metrics endpoint used to yield to live traffic.
+            Set to None to never wait. Defaults to "http://localhost:8000/metrics".
+        idle_poll_seconds (float, optional): Seconds between idleness checks. Defaults to 1.0.
+    """
+
+    def __init__(self, generator, metrics_url=METRICS_URL, idle_poll_seconds=1.0):
+        self.generator = generator
+        self.cache = generator.answer_cache
+        self.metrics_url = metrics_url
+        self.idle_poll_seconds = idle_poll_seconds
+        self.session = requests.Session()
+
+    def wait_until_idle(self):
+        """
+        Blocks while the backend has generations queued or running. Queue depth and
+        in-flight counts are shared by pre-forked workers, so any worker's answer covers
+        the whole server.
+        """
+        if not self.metrics_url:
+            return
+        while True:
+            try:
+                admission = self.session.get(self.metrics_url, timeout=2).json()[
+                    "admission"
+                ]
+            except (requests.RequestException, ValueError, KeyError):
+                return
+            if admission["queue_depth"] == 0 and admission["in_flight"] == 0:
+                return
+            time.sleep(self.idle_poll_seconds)
+
+    def warm(self, questions):
+        """
+        Brings the answer cache up to date for the given questions.
+        Args:
+            questions (list): Questions to warm.
+        Returns:
+            dict: Counts of 'fresh', 'carried_over' and 'generated' questions.
+        """
+        version = self.generator.collection_version()
+        counts = {"fresh": 0, "carried_over": 0, "generated": 0}
+
+        for query in questions:
+            entry = self.cache.get_entry(query)
+            if entry is not None and entry["version"] == version:
+                counts["fresh"] += 1
+                continue
+
+            retrieved_chunks = self.generator.retriever.retrieve_top_k(query)
+            chunk_ids = [chunk["id"] for chunk in retrieved_chunks]
+            if entry is not None and entry["chunk_ids"] == chunk_ids:
+                self.cache.put(query, version, chunk_ids, entry["answer"])
+                counts["carried_over"] += 1
+                continue
+
+            self.wait_until_idle()
+            answer = self.generator.answer_from_chunks(query, retrieved_chunks)
+            self.cache.put(query, version, chunk_ids, answer)
+            # Persist as we go so live traffic benefits before the run finishes
+            self.cache.save()
+            counts["generated"] += 1
+
+        self.cache.save()
+        print(
+            f"✅ Warmed {len(questions)} questions for version {version}: "
+            f"{counts['fresh']} fresh, {counts['carried_over']} carried over, "
+            f"{counts['generated']} generated"
+        )
+        return counts
+
+
+if __name__ == "__main__":
+    # Run below the serving processes so warming never competes for CPU
+    if hasattr(os, "nice"):
+        os.nice(10)
+
+    from src.generator import Generator
+
+    questions = load_questions(sys.argv[1] if len(sys.argv) > 1 else None)
+    generator = Generator(snapshot_poll_interval=None, max_concurrency=1, max_queue=0)
+    CacheWarmer(generator).warm(questions)
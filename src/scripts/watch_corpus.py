@@ -0,0 +1,227 @@
+import os
+import time
+import threading
+from src.config import load_config
+from src.data_loader import DataLoader
+from src.deduplicator import Deduplicator
+from src.embedder import Embedder
+from src.snapshots import SnapshotManager
+from src.vector_store import VectorStoreManager
+
+SUPPORTED_EXTENSIONS = {".pdf", ".docx", ".pptx", ".csv"}
+
+
+class CorpusWatcher:
+    """
+    Watches the corpus directory and incrementally ingests added, modified and deleted
+    files into a new vector store snapshot, which is then published for the serving
+    process to pick up without a restart.
+    Changes are debounced: ingestion starts once no further change has been seen for
+    `debounce_seconds`, so a file being copied in does not trigger several runs.
+    Args:
+        corpus_dir (str, optional): Directory to watch. Defaults to "./corpus".
+        vector_store_path (str, optional): Root of the vector store. Defaults to "./chroma_store".
+        poll_interval (float, optional): Seconds between directory scans. Defaults to 1.0.
+        debounce_seconds (float, optional): Quiet period before ingesting. Defaults to 2.0.
+        shard_key (str, optional): Metadata key to shard a new store by. An existing
+            store keeps the layout recorded in its manifest. Defaults to None.
+        export_mmap_index (bool, optional): Export each published snapshot to a
+            memory-mapped index for pre-forked servers. Defaults to False.
+    """
+
+    def __init__(
+        self,
+        corpus_dir="./corpus",
+        vector_store_path="./chroma_store",
+        poll_interval=1.0,
+        debounce_seconds=2.0,
+        shard_key=None,
+        export_mmap_index=False,
+    ):
+        self.corpus_dir = corpus_dir
+        self.poll_interval = poll_interval
+        self.debounce_seconds = debounce_seconds
+        self.shard_key = shard_key
+        self.loader = DataLoader(corpus_dir=corpus_dir)
+        self.embedder = Embedder()
+        self.deduplicator = Deduplicator()
+        self.snapshots = SnapshotManager(
+            vector_store_path, export_mmap_index=export_mmap_index
+        )
+        self.mtimes = {}
+        self.pending = {}
+        self.last_change = None
+        self._stop = threading.Event()
+
+        for path, mtime in self.scan().items():
+            self.mtimes[path] = mtime
+            if self.loader.file_hash(path) not in self.loader.processed_hashes:
+                self.pending[path] = mtime
+        if self.pending:
+            self.last_change = time.monotonic()
+
+    def scan(self):
+        """
+        Scans the corpus directory for supported files.
+        Returns:
+            dict: Mapping of file path to modification time.
+        """
+        found = {}
+        for root, _, files in os.walk(self.corpus_dir):
+            for file in files:
+                if os.path.splitext(file)[1].lower() not in SUPPORTED_EXTENSIONS:
+                    continue
+                file_path = os.path.join(root, file)
+                try:
+                    found[file_path] = os.path.getmtime(file_path)
+                except FileNotFoundError:
+                    continue
+        return found
+
+    def poll(self):
+        """
+        Compares the corpus against the last scan and records changed files as pending.
+        Returns:
+            None
+        """
+        current = self.scan()
+        changed = False
+        for path, mtime in current.items():
+            if self.mtimes.get(path) != mtime:
+                self.mtimes[path] = mtime
+                self.pending.setdefault(path, mtime)
+                changed = True
+        for path in set(self.mtimes) - set(current):
+            del self.mtimes[path]
+            self.pending.setdefault(path, time.time())
+            changed = True
+        if changed:
+            self.last_change = time.monotonic()
+
+    def index_changes(self, manager, changes):
+        """
+        Removes the old rows of each changed file and indexes its current chunks.
+        Files holding copies of a removed canonical chunk are re-extracted too, so one
+        of those copies is indexed in its place.
+        Args:
+            manager (VectorStoreManager): Manager writing to the unpublished snapshot.
+            changes (dict): Mapping of changed file path to the time it changed.
+        Returns:
+            None
+        """
+        chunks = []
+        reindex = set()
+        for path in changes:
+            manager.delete_where({"source": path})
+            reindex |= self.deduplicator.remove_source(path)
+            file_hash = self.loader.file_hash(path)
+            if not os.path.exists(path):
+                self.loader.processed_hashes.discard(file_hash)
+                continue
+            try:
+                chunks.extend(list(self.loader.extract_file(path) or []))
+                self.loader.processed_hashes.add(file_hash)
+            except Exception as e:
+                print(f"Error processing {path}: {e}")
+
+        for path in sorted(reindex - set(changes)):
+            if not os.path.exists(path):
+                continue
+            try:
+                chunks.extend(list(self.loader.extract_file(path) or []))
+            except Exception as e:
+                print(f"Error re-extracting {path}: {e}")
+
+        chunks = self.deduplicator.deduplicate(chunks, report=False)
+        if chunks:
+            chunks_to_embed, embeddings, _ = self.embedder.embed_chunks(chunks)
+            data = self.embedder.prepare_data_for_vector_store(
+                chunks_to_embed, embeddings
+            )
+            manager.populate_vector_store(data)
+            manager.clear_checkpoint()
+        self.deduplicator.report(seconds_per_chunk=self.embedder.seconds_per_chunk)
+        manager.update_metadata(self.deduplicator.location_updates)
+
+    def ingest(self, changes):
+        """
+        Ingests a set of changed files into a new snapshot and publishes it.
+        Rows previously indexed for each changed file are removed first so modified
+        and deleted files leave no stale chunks behind.
+        Args:
+            changes (dict): Mapping of changed file path to the time it changed.
+        Returns:
+            None
+        """
+        snapshot_path = self.snapshots.prepare()
+        manager = VectorStoreManager(
+            vector_store_path=snapshot_path, shard_key=self.shard_key
+        )
+        try:
+            self.index_changes(manager, changes)
+        finally:
+            manager.close()
+        self.snapshots.publish(snapshot_path, changes)
+        self.loader.update_processed_files()
+        self.deduplicator.location_updates = {}
+        self.deduplicator.save()
+
+        now = time.time()
+        lags = [now - changed_at for changed_at in changes.values()]
+        print(
+            f"⏱️ Ingested {len(changes)} files, lag max {max(lags):.1f}s, "
+            f"mean {sum(lags) / len(lags):.1f}s"
+        )
+
+    def run(self):
+        """
+        Polls the corpus until stopped, ingesting pending changes once debounced.
+        Returns:
+            None
+        """
+        print(f"👀 Watching {self.corpus_dir} for changes...")
+        while not self._stop.is_set():
+            self.poll()
+            quiet_for = (
+                time.monotonic() - self.last_change if self.last_change else 0
+            )
+            if self.pending and quiet_for >= self.debounce_seconds:
+                changes, self.pending = self.pending, {}
+                try:
+                    self.ingest(changes)
+                except Exception as e:
+                    print(f"Error ingesting changes: {e}")
+                    # Drop in-memory dedup state for the failed run so the retry
+                    # starts from what was last published
+                    self.deduplicator = Deduplicator(self.deduplicator.index_path)
+                    for path, changed_at in changes.items():
+                        self.pending.setdefault(path, changed_at)
+            self._stop.wait(self.poll_interval)
+
+    def start(self):
+        """
+        Runs the watcher in a background daemon thread.
+        Returns:
+            threading.Thread: The started thread.
+        """
+        thread = threading.Thread(target=self.run, name="corpus-watcher", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        """
+        Signals the watcher loop to exit after the current iteration.
+        """
+        self._stop.set()
+
+
+if __name__ == "__main__":
+    config = load_config()
+    watcher = CorpusWatcher(
+        shard_key=config.get("shard_key"),
+        export_mmap_index=config.get("mmap_index", False),
+    )
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        watcher.stop()
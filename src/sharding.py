@@ -0,0 +1,212 @@
+import os
+import re
+import json
+import hashlib
+
+LOGICAL_OPERATORS = ("$and", "$or")
+FIELD_OPERATORS = ("$eq", "$ne", "$gt", "$gte", "$lt", "$lte", "$in", "$nin")
+
+
+def validate_where(where):
+    """
+    Validates a ChromaDB `where` filter before it reaches a collection, so malformed
+    client filters are rejected up front instead of failing inside the query.
+    Args:
+        where (dict): The filter, e.g. {"type": "table"} or {"$and": [{...}, {...}]}.
+    Raises:
+        ValueError: If the filter is not a valid ChromaDB `where` clause.
+    """
+    if not isinstance(where, dict) or not where:
+        raise ValueError("Filter must be a non-empty object")
+    if len(where) != 1:
+        raise ValueError(
+            "Filter must have exactly one top-level key; combine conditions with $and or $or"
+        )
+    key, condition = next(iter(where.items()))
+    if key in LOGICAL_OPERATORS:
+        if not isinstance(condition, list) or len(condition) < 2:
+            raise ValueError(f"{key} expects a list of at least two filters")
+        for clause in condition:
+            validate_where(clause)
+        return
+    if key.startswith("$"):
+        raise ValueError(f"Unsupported operator {key}")
+    if isinstance(condition, dict):
+        if len(condition) != 1:
+            raise ValueError(f"Condition on '{key}' must have exactly one operator")
+        op, operand = next(iter(condition.items()))
+        if op not in FIELD_OPERATORS:
+            raise ValueError(f"Unsupported operator {op} on '{key}'")
+        if op in ("$in", "$nin"):
+            if not isinstance(operand, list) or not all(
+                isinstance(v, (str, int, float, bool)) for v in operand
+            ):
+                raise ValueError(f"{op} on '{key}' expects a list of scalar values")
+        elif op in ("$gt", "$gte", "$lt", "$lte"):
+            if isinstance(operand, bool) or not isinstance(operand, (int, float)):
+                raise ValueError(f"{op} on '{key}' expects a number")
+        elif not isinstance(operand, (str, int, float, bool)):
+            raise ValueError(f"{op} on '{key}' expects a scalar value")
+    elif not isinstance(condition, (str, int, float, bool)):
+        raise ValueError(f"Condition on '{key}' must be a scalar or an operator object")
+
+
+class ShardRouter:
+    """
+    Maps chunks to ChromaDB collections ("shards") by a configurable metadata key and
+    selects which shards a query needs to search.
+    The shard layout is recorded in a manifest inside the vector store directory, so it
+    travels with each snapshot and readers do not need to be configured with the key.
+    With no shard key everything lives in a single collection, as before.
+    Attributes:
+        vector_store_path (str): Directory of the vector store (or snapshot).
+        collection_name (str): Base collection name; shard collections are derived from it.
+        shard_key (str or None): Metadata field used for sharding: "type", "source_dir" or None.
+        shards (dict): Mapping of shard value to collection name.
+    Methods:
+        shard_value(metadata): Returns the shard value for a chunk's metadata.
+        collection_for(metadata): Returns (registering if needed) the collection for a chunk.
+        save_manifest(): Persists the shard layout.
+        select_collections(where=None): Returns the collections a query must search.
+    """
+
+    SHARD_KEYS = ("type", "source_dir")
+    MANIFEST_FILE = "shards.json"
+
+    def __init__(self, vector_store_path, collection_name="interview-prep", shard_key=None):
+        if shard_key is not None and shard_key not in self.SHARD_KEYS:
+            raise ValueError(
+                f"Unsupported shard key '{shard_key}'. Expected one of {self.SHARD_KEYS}."
+            )
+        self.vector_store_path = vector_store_path
+        self.collection_name = collection_name
+        self.manifest_path = os.path.join(vector_store_path, self.MANIFEST_FILE)
+        self.shards = {}
+        self.has_manifest = False
+
+        manifest = self.load_manifest()
+        if manifest is not None:
+            if shard_key is not None and shard_key != manifest["shard_key"]:
+                raise ValueError(
+                    f"Vector store at {vector_store_path} is sharded by "
+                    f"'{manifest['shard_key']}', not '{shard_key}'. Rebuild it to change the shard key."
+                )
+            shard_key = manifest["shard_key"]
+            self.shards = manifest["shards"]
+            self.has_manifest = True
+        self.shard_key = shard_key
+
+    def load_manifest(self):
+        """
+        Loads the shard manifest for this vector store.
+        Returns:
+            dict or None: The manifest ('shard_key', 'shards'), or None if the store is unsharded.
+        """
+        if not os.path.exists(self.manifest_path):
+            return None
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("collection_name") != self.collection_name:
+            return None
+        return manifest
+
+    def save_manifest(self):
+        """
+        Persists the shard layout. Does nothing for an unsharded store.
+        Returns:
+            None
+        """
+        if self.shard_key is None:
+            return
+        os.makedirs(self.vector_store_path, exist_ok=True)
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "collection_name": self.collection_name,
+                    "shard_key": self.shard_key,
+                    "shards": self.shards,
+                },
+                f,
+                indent=2,
+            )
+        os.replace(tmp_path, self.manifest_path)
+
+    def shard_value(self, metadata):
+        """
+        Returns the shard value for a chunk's metadata.
+        Args:
+            metadata (dict): The chunk metadata.
+        Returns:
+            str or None: The shard value, or None if the store is unsharded.
+        """
+        if self.shard_key == "type":
+            return str(metadata.get("type", "text"))
+        if self.shard_key == "source_dir":
+            return str(
+                metadata.get("source_dir")
+                or os.path.dirname(metadata.get("source", ""))
+            )
+        return None
+
+    def collection_for(self, metadata):
+        """
+        Returns the collection a chunk belongs to, registering a new shard if needed.
+        Args:
+            metadata (dict): The chunk metadata.
+        Returns:
+            str: The collection name.
+        """
+        value = self.shard_value(metadata)
+        if value is None:
+            return self.collection_name
+        if value not in self.shards:
+            slug = re.sub(r"[^a-zA-Z0-9_-]+", "_", value).strip("_")[:32] or "root"
+            digest = hashlib.sha1(value.encode("utf-8")).hexdigest()[:8]
+            self.shards[value] = f"{self.collection_name}-{slug}-{digest}"
+        return self.shards[value]
+
+    def all_collections(self):
+        """
+        Returns every collection in the store.
+        Returns:
+            list: Collection names.
+        """
+        if self.shard_key is None:
+            return [self.collection_name]
+        return list(self.shards.values())
+
+    def select_collections(self, where=None):
+        """
+        Returns the collections a query must search. Equality and `$in` conditions on the
+        shard key, at the top level or inside a top-level `$and`, prune the shard list
+        so shards that cannot match are never scored.
+        Args:
+            where (dict, optional): A ChromaDB `where` filter.
+        Returns:
+            list: Collection names to search.
+        """
+        if self.shard_key is None or not where:
+            return self.all_collections()
+        allowed = self._allowed_values(where)
+        if allowed is None:
+            return self.all_collections()
+        return [name for value, name in self.shards.items() if value in allowed]
+
+    def _allowed_values(self, where):
+        clauses = where.get("$and", [where])
+        allowed = None
+        for clause in clauses:
+            if self.shard_key not in clause:
+                continue
+            condition = clause[self.shard_key]
+            if not isinstance(condition, dict):
+                values = {condition}
+            elif "$eq" in condition:
+                values = {condition["$eq"]}
+            elif "$in" in condition:
+                values = set(condition["$in"])
+            else:
+                continue
+            allowed = values if allowed is None else allowed & values
+        return allowed
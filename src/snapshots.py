@@ -0,0 +1,188 @@
+import os
+import json
+import time
+import shutil
+from src.mmap_index import MmapIndex
+
+
+class SnapshotManager:
+    """
+    Manages immutable snapshots of the ChromaDB vector store so that ingestion never
+    writes to the directory the serving process is reading.
+    Each ingestion run copies the current snapshot into a new directory under
+    `snapshots/`, writes to the copy, and then atomically repoints `CURRENT.json`
+    at it. Readers poll the pointer and switch to the new snapshot when it changes.
+    Attributes:
+        vector_store_path (str): Root directory of the vector store.
+        pointer_path (str): Path to the JSON pointer naming the live snapshot.
+        snapshots_dir (str): Directory holding all snapshot directories.
+        keep (int): Number of most recent snapshots to retain when pruning.
+        export_mmap_index (bool): Export each snapshot to a memory-mapped index before
+            publishing it, for servers that search with `use_mmap_index`.
+    Methods:
+        read_pointer(): Reads the pointer to the live snapshot.
+        current_path(): Returns the directory of the live snapshot.
+        prepare(resume=False): Creates a writable copy of the live snapshot, or resumes an
+            interrupted one.
+        checkpoint_path(snapshot_path): Returns the indexing checkpoint log of a snapshot.
+        publish(snapshot_path, changes=None): Atomically makes a snapshot live.
+        prune(): Deletes old snapshots beyond `keep`.
+    """
+
+    POINTER_FILE = "CURRENT.json"
+    SNAPSHOTS_DIR = "snapshots"
+    INFO_FILE = "snapshot.json"
+    CHECKPOINT_FILE = "index_checkpoint.jsonl"
+
+    def __init__(self, vector_store_path="./chroma_store", keep=3, export_mmap_index=False):
+        self.vector_store_path = vector_store_path
+        self.export_mmap_index = export_mmap_index
+        self.pointer_path = os.path.join(vector_store_path, self.POINTER_FILE)
+        self.snapshots_dir = os.path.join(vector_store_path, self.SNAPSHOTS_DIR)
+        self.keep = max(2, keep)
+
+    def read_pointer(self):
+        """
+        Reads the pointer to the live snapshot.
+        Returns:
+            dict or None: The pointer contents ('snapshot', 'published_at', 'changes'),
+                or None if no snapshot has been published yet.
+        """
+        if not os.path.exists(self.pointer_path):
+            return None
+        with open(self.pointer_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def current_path(self):
+        """
+        Returns the directory of the live snapshot. Falls back to the vector store root
+        for stores created before snapshots were introduced.
+        Returns:
+            str: Path to pass to `chromadb.PersistentClient`.
+        """
+        pointer = self.read_pointer()
+        if pointer is None:
+            return self.vector_store_path
+        return os.path.join(self.vector_store_path, pointer["snapshot"])
+
+    def checkpoint_path(self, snapshot_path):
+        """
+        Returns the path of the indexing checkpoint log kept inside a snapshot, so a
+        checkpoint always describes the directory its IDs were written to.
+        Args:
+            snapshot_path (str): A snapshot directory.
+        Returns:
+            str: Path to the checkpoint log.
+        """
+        return os.path.join(snapshot_path, self.CHECKPOINT_FILE)
+
+    def find_resumable(self):
+        """
+        Finds an unpublished snapshot left behind by an interrupted run that was copied
+        from the snapshot that is still live, and so can be safely resumed.
+        Returns:
+            str or None: Path of the snapshot to resume.
+        """
+        if not os.path.isdir(self.snapshots_dir):
+            return None
+        pointer = self.read_pointer()
+        current = pointer["snapshot"] if pointer else None
+        names = sorted(
+            (n for n in os.listdir(self.snapshots_dir) if n.isdigit()),
+            key=int,
+            reverse=True,
+        )
+        for name in names:
+            path = os.path.join(self.snapshots_dir, name)
+            info_path = os.path.join(path, self.INFO_FILE)
+            if not os.path.exists(self.checkpoint_path(path)) or not os.path.exists(
+                info_path
+            ):
+                continue
+            with open(info_path, "r", encoding="utf-8") as f:
+                if json.load(f).get("base") == current:
+                    return path
+        return None
+
+    def prepare(self, resume=False):
+        """
+        Creates a new snapshot directory seeded with a copy of the live snapshot.
+        Args:
+            resume (bool, optional): Reuse an interrupted, unpublished snapshot copied from
+                the live one instead, so its checkpointed batches are not lost. Defaults to False.
+        Returns:
+            str: Path of the new, not yet published, snapshot directory.
+        """
+        if resume:
+            snapshot_path = self.find_resumable()
+            if snapshot_path is not None:
+                print(f"⏩ Resuming unpublished snapshot {snapshot_path}")
+                return snapshot_path
+
+        os.makedirs(self.snapshots_dir, exist_ok=True)
+        snapshot_path = os.path.join(self.snapshots_dir, str(time.time_ns()))
+        source = self.current_path()
+        if os.path.isdir(source):
+            shutil.copytree(
+                source,
+                snapshot_path,
+                ignore=shutil.ignore_patterns(
+                    self.SNAPSHOTS_DIR,
+                    self.POINTER_FILE,
+                    self.INFO_FILE,
+                    self.CHECKPOINT_FILE,
+                    MmapIndex.INDEX_DIR,
+                ),
+            )
+        else:
+            os.makedirs(snapshot_path)
+
+        pointer = self.read_pointer()
+        with open(
+            os.path.join(snapshot_path, self.INFO_FILE), "w", encoding="utf-8"
+        ) as f:
+            json.dump({"base": pointer["snapshot"] if pointer else None}, f)
+        return snapshot_path
+
+    def publish(self, snapshot_path, changes=None):
+        """
+        Atomically makes a snapshot live by replacing the pointer file. With
+        `export_mmap_index`, the snapshot's memory-mapped index is built first, so it
+        exists before any reader can switch to the snapshot.
+        Args:
+            snapshot_path (str): Directory returned by `prepare()`.
+            changes (dict, optional): Mapping of changed file path to the time the change
+                happened, used by readers to report ingestion lag.
+        Returns:
+            None
+        """
+        if self.export_mmap_index:
+            MmapIndex.export(snapshot_path)
+        pointer = {
+            "snapshot": os.path.relpath(snapshot_path, self.vector_store_path),
+            "published_at": time.time(),
+            "changes": changes or {},
+        }
+        tmp_path = f"{self.pointer_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(pointer, f, indent=2)
+        os.replace(tmp_path, self.pointer_path)
+        print(f"✅ Published snapshot {pointer['snapshot']}")
+        self.prune()
+
+    def prune(self):
+        """
+        Deletes all but the `keep` most recent snapshots. The live snapshot and the one
+        before it are always retained so in-flight queries can finish on the old index.
+        Returns:
+            None
+        """
+        if not os.path.isdir(self.snapshots_dir):
+            return
+        names = sorted(
+            (n for n in os.listdir(self.snapshots_dir) if n.isdigit()), key=int
+        )
+        current = os.path.basename(self.current_path())
+        for name in names[: -self.keep]:
+            if name != current:
+                shutil.rmtree(os.path.join(self.snapshots_dir, name), ignore_errors=True)
@@ -1,5 +1,62 @@
+import os
 import json
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
 import chromadb
+from src.config import load_config
+from src.sharding import ShardRouter
+from src.snapshots import SnapshotManager
+
+
+def release_client(path):
+    """
+    Stops and evicts the ChromaDB client cached for a persistent path. Chroma keeps one
+    client (with its SQLite connection and caches) per path for the life of the process,
+    so processes that move across snapshots must release the ones they leave behind.
+    Args:
+        path (str): The path the client was created with.
+    Returns:
+        None
+    """
+    try:
+        from chromadb.api.shared_system_client import SharedSystemClient
+    except ImportError:
+        from chromadb.api.client import SharedSystemClient
+    system = SharedSystemClient._identifier_to_system.pop(path, None)
+    if system is not None:
+        system.stop()
+
+
+def iter_embedded_items(embedded_file):
+    """
+    Streams embedded items from a JSONL file, one item per line.
+    Args:
+        embedded_file (str): Path to the embedded data JSONL file.
+    Yields:
+        dict: An item with 'id', 'embedding', 'document' and 'metadata'.
+    """
+    with open(embedded_file, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def count_pending_items(embedded_file="./processed_corpus/embedded_chunks.jsonl"):
+    """
+    Counts embedded items not yet saved to a published snapshot, so callers can skip
+    copying and publishing a snapshot when a run has nothing to index.
+    Args:
+        embedded_file (str, optional): Path to the embedded data JSONL file.
+    Returns:
+        int: Number of pending items.
+    """
+    if not os.path.exists(embedded_file):
+        return 0
+    return sum(
+        1
+        for item in iter_embedded_items(embedded_file)
+        if not item["metadata"].get("saved_to_db", False)
+    )
 
 
 class VectorStoreManager:
@@ -11,99 +68,321 @@ class VectorStoreManager:
     Args:
         vector_store_path (str, optional): Path to the ChromaDB persistent storage directory.
             Defaults to "./chroma_store".
-        embedded_file (str, optional): Path to the JSON file containing embedded data.
-            Defaults to "./processed_corpus/embedded_chunks.json".
+        embedded_file (str, optional): Path to the JSONL file containing embedded data.
+            Defaults to "./processed_corpus/embedded_chunks.jsonl".
         collection_name (str, optional): Name of the ChromaDB collection to use.
             Defaults to "interview-prep".
+        batch_size (int, optional): Maximum number of items sent per upsert call.
+            Clamped to the client's maximum batch size. Defaults to 1000.
+        checkpoint_file (str, optional): Path to the append-only JSONL log of IDs already
+            upserted by an in-progress run. Defaults to "index_checkpoint.jsonl" inside
+            `vector_store_path`, so the checkpoint always belongs to the store it describes.
+        num_writers (int, optional): Number of parallel upsert writers. Defaults to 1.
+        shard_key (str, optional): Metadata field to shard collections by ("type" or
+            "source_dir"). Defaults to None, which keeps a single collection. A store
+            that is already sharded keeps the key recorded in its manifest.
+    Raises:
+        ValueError: If `shard_key` is set for a store that already holds unsharded data.
     """
 
     def __init__(
         self,
         vector_store_path="./chroma_store",
-        embedded_file="./processed_corpus/embedded_chunks.json",
+        embedded_file="./processed_corpus/embedded_chunks.jsonl",
         collection_name="interview-prep",
+        batch_size=1000,
+        checkpoint_file=None,
+        num_writers=1,
+        shard_key=None,
     ):
         self.embedded_file = embedded_file
+        self.vector_store_path = vector_store_path
         self.collection_name = collection_name
-        self.client = chromadb.PersistentClient(path=vector_store_path)
-        self.collection = self.client.get_or_create_collection(
-            name=self.collection_name
+        self.checkpoint_file = checkpoint_file or os.path.join(
+            vector_store_path, SnapshotManager.CHECKPOINT_FILE
         )
+        self.num_writers = max(1, num_writers)
+        self.client = chromadb.PersistentClient(path=vector_store_path)
+        self.router = ShardRouter(vector_store_path, collection_name, shard_key)
+        self.collections = {}
+        if (
+            self.router.shard_key is not None
+            and not self.router.has_manifest
+            and self._collection_count(collection_name) > 0
+        ):
+            release_client(vector_store_path)
+            raise ValueError(
+                f"Vector store at {vector_store_path} already holds an unsharded "
+                f"'{collection_name}' collection. Rebuild it to shard by "
+                f"'{self.router.shard_key}'."
+            )
+        max_batch_size = getattr(self.client, "get_max_batch_size", None)
+        if max_batch_size is not None:
+            batch_size = min(batch_size, max_batch_size())
+        self.batch_size = max(1, batch_size)
+        self._checkpoint_lock = threading.Lock()
 
     def load_embedded_data(self):
         """
-        Loads embedded data from the specified JSON file.
+        Streams embedded data from the specified JSONL file.
         Returns:
-            list: A list of dictionaries, each representing an embedded data chunk.
+            iterator: Dictionaries, each representing an embedded data chunk.
         """
-        with open(self.embedded_file, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return iter_embedded_items(self.embedded_file)
 
-    def populate_vector_store(self, data):
+    def load_checkpoint(self):
         """
-        Adds new embedded data to the ChromaDB collection if not already indexed.
+        Loads the set of IDs already upserted by an interrupted indexing run.
+        Returns:
+            set: A set of chunk IDs that have already been written to the collection.
+        """
+        indexed_ids = set()
+        if os.path.exists(self.checkpoint_file):
+            with open(self.checkpoint_file, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        indexed_ids.update(json.loads(line))
+                    except ValueError:
+                        # A batch interrupted mid-write was not recorded; it is re-sent
+                        continue
+        return indexed_ids
+
+    def save_checkpoint(self, ids):
+        """
+        Appends one batch of upserted IDs to the checkpoint log, so each batch costs
+        I/O proportional to its own size rather than to the whole run.
         Args:
-            data (list): A list of dictionaries containing embedding information.
-                Each dictionary should have 'id', 'embedding', 'document', and 'metadata' keys.
+            ids (list): Chunk IDs of the batch just written to the collection.
         Returns:
             None
         """
-        data_for_indexing = [
-            item for item in data if not item["metadata"].get("saved_to_db", False)
-        ]
-        if not data_for_indexing:
-            print("No new data to index in ChromaDB.")
+        os.makedirs(os.path.dirname(self.checkpoint_file) or ".", exist_ok=True)
+        with open(self.checkpoint_file, "a", encoding="utf-8") as f:
+            f.write(json.dumps(ids) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def clear_checkpoint(self):
+        """
+        Removes the checkpoint file once a run has completed and flags are persisted.
+        Returns:
+            None
+        """
+        if os.path.exists(self.checkpoint_file):
+            os.remove(self.checkpoint_file)
+
+    def _collection_count(self, name):
+        try:
+            return self.client.get_collection(name=name).count()
+        except Exception:
+            return 0
+
+    def close(self):
+        """
+        Releases the ChromaDB client for this store.
+        Returns:
+            None
+        """
+        self.collections = {}
+        release_client(self.vector_store_path)
+
+    def get_collection(self, name):
+        """
+        Returns a ChromaDB collection by name, creating it if needed.
+        Args:
+            name (str): The collection name.
+        Returns:
+            chromadb.Collection: The collection.
+        """
+        if name not in self.collections:
+            self.collections[name] = self.client.get_or_create_collection(name=name)
+        return self.collections[name]
+
+    def delete_where(self, where):
+        """
+        Deletes matching rows from every shard collection.
+        Args:
+            where (dict): A ChromaDB `where` filter, e.g. {"source": path}.
+        Returns:
+            None
+        """
+        for name in self.router.all_collections():
+            self.get_collection(name).delete(where=where)
+
+    def update_metadata(self, updates):
+        """
+        Merges metadata fields into already indexed chunks, in whichever shard they live.
+        Args:
+            updates (dict): Mapping of chunk ID to the metadata fields to set.
+        Returns:
+            None
+        """
+        if not updates:
             return
+        ids = list(updates)
+        for name in self.router.all_collections():
+            collection = self.get_collection(name)
+            for i in range(0, len(ids), self.batch_size):
+                found = collection.get(
+                    ids=ids[i : i + self.batch_size], include=["metadatas"]
+                )
+                if not found["ids"]:
+                    continue
+                collection.update(
+                    ids=found["ids"],
+                    metadatas=[
+                        {**(meta or {}), **updates[chunk_id]}
+                        for chunk_id, meta in zip(found["ids"], found["metadatas"])
+                    ],
+                )
+        print(f"✅ Updated metadata for {len(updates)} indexed chunks")
+
+    def upsert_batch(self, collection_name, batch):
+        """
+        Upserts a single batch of embedded items into a ChromaDB collection.
+        Args:
+            collection_name (str): The shard collection to write to.
+            batch (list): A list of dictionaries with 'id', 'embedding', 'document', and 'metadata' keys.
+        Returns:
+            list: The IDs that were upserted.
+        """
+        ids = [item["id"] for item in batch]
+        self.get_collection(collection_name).upsert(
+            ids=ids,
+            embeddings=[item["embedding"] for item in batch],
+            documents=[item["document"] for item in batch],
+            metadatas=[item["metadata"] for item in batch],
+        )
+        return ids
+
+    def populate_vector_store(self, data):
+        """
+        Upserts new embedded data into its shard collections in batches of at most
+        `batch_size` items. Items are consumed as they are read, so only the batches
+        being filled or written are held in memory. Progress is checkpointed after
+        every batch so that an interrupted run resumes from the first batch that was
+        not written.
+        Args:
+            data (iterable): Dictionaries containing embedding information, e.g. from
+                `load_embedded_data()`. Each dictionary should have 'id', 'embedding',
+                'document', and 'metadata' keys.
+        Returns:
+            None
+        """
+        indexed_ids = self.load_checkpoint()
+        if indexed_ids:
+            print(f"⏩ Resuming from checkpoint: {len(indexed_ids)} items already indexed.")
 
-        ids = [item["id"] for item in data_for_indexing]
-        embeddings = [item["embedding"] for item in data_for_indexing]
-        documents = [item["document"] for item in data_for_indexing]
-        metadatas = [item["metadata"] for item in data_for_indexing]
+        def record(ids):
+            with self._checkpoint_lock:
+                self.save_checkpoint(ids)
 
-        self.collection.add(
-            ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas
+        pool = (
+            ThreadPoolExecutor(max_workers=self.num_writers)
+            if self.num_writers > 1
+            else None
         )
+        in_flight = set()
+
+        def flush(name, batch):
+            self.get_collection(name)
+            self.router.save_manifest()
+            if pool is None:
+                record(self.upsert_batch(name, batch))
+                return
+            # Bound the batches waiting on writers so reading stays ahead by little
+            while len(in_flight) >= 2 * self.num_writers:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    in_flight.discard(future)
+                    record(future.result())
+            in_flight.add(pool.submit(self.upsert_batch, name, batch))
+
+        pending = {}
+        indexed, batches = 0, 0
+        try:
+            for item in data:
+                if item["metadata"].get("saved_to_db", False) or item["id"] in indexed_ids:
+                    continue
+                name = self.router.collection_for(item["metadata"])
+                batch = pending.setdefault(name, [])
+                batch.append(item)
+                indexed += 1
+                if len(batch) >= self.batch_size:
+                    flush(name, pending.pop(name))
+                    batches += 1
+            for name, batch in pending.items():
+                flush(name, batch)
+                batches += 1
+            for future in as_completed(in_flight):
+                record(future.result())
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=True)
+
+        if not indexed:
+            print("No new data to index in ChromaDB.")
+            return
         print(
-            f"✅ Indexed {len(data_for_indexing)} items into ChromaDB collection: '{self.collection_name}'"
+            f"✅ Indexed {indexed} items in {batches} batches across {len(self.router.all_collections())} ChromaDB collection(s)"
         )
 
     def update_saved_flag(self):
         """
-        Updates the 'saved_to_db' flag in the embedded data JSON file for chunks
-        that have been indexed in the vector store.
+        Updates the 'saved_to_db' flag in the embedded data JSONL file for chunks
+        that have been indexed in the vector store. The file is rewritten line by
+        line into a temporary file that then replaces it.
         Returns:
             None
         """
-        updated_chunks = []
         update_count = 0
-        with open(self.embedded_file, "r", encoding="utf-8") as f:
-            embedded_data = json.load(f)
-            for chunk in embedded_data:
+        tmp_path = f"{self.embedded_file}.tmp"
+        with open(self.embedded_file, "r", encoding="utf-8") as src, open(
+            tmp_path, "w", encoding="utf-8"
+        ) as dst:
+            for line in src:
+                if not line.strip():
+                    continue
+                chunk = json.loads(line)
                 if not chunk["metadata"].get("saved_to_db", False):
                     chunk["metadata"]["saved_to_db"] = True
                     update_count += 1
-                updated_chunks.append(chunk)
-
-        with open(self.embedded_file, "w", encoding="utf-8") as f:
-            json.dump(updated_chunks, f, indent=2)
+                dst.write(json.dumps(chunk) + "\n")
+        os.replace(tmp_path, self.embedded_file)
 
         print(
             f"✅ Updated 'saved_to_db' flag for {update_count} chunks in {self.embedded_file}"
         )
 
-    def run_pipeline(self):
+    def run_pipeline(self, publish=None):
         """
         Executes the full pipeline: loads embedded data, populates the vector store,
         and updates the 'saved_to_db' flags.
+        Args:
+            publish (callable, optional): Called after indexing and before items are
+                flagged as saved, e.g. to publish the snapshot being written. If it
+                fails, the items stay pending and are indexed again on the next run.
         Returns:
             None
         """
         data = self.load_embedded_data()
         self.populate_vector_store(data)
+        if publish is not None:
+            publish()
         self.update_saved_flag()
+        self.clear_checkpoint()
         print("✅ Vector store populated and flags updated successfully.")
 
 
 if __name__ == "__main__":
-    manager = VectorStoreManager()
-    manager.run_pipeline()
+    if not count_pending_items():
+        print("✅ Nothing new to index, keeping the current snapshot.")
+    else:
+        # Write to an unpublished snapshot, never the one the backend is reading
+        config = load_config()
+        snapshots = SnapshotManager(export_mmap_index=config.get("mmap_index", False))
+        snapshot_path = snapshots.prepare(resume=True)
+        manager = VectorStoreManager(
+            vector_store_path=snapshot_path, shard_key=config.get("shard_key")
+        )
+        manager.run_pipeline(publish=lambda: snapshots.publish(snapshot_path))